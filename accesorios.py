@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import functools
+from collections import deque
+from typing import Dict, List, Tuple
+
+from perezoso import Perezoso
+
+np = Perezoso("numpy", globals())
+pd = Perezoso("pandas", globals())
+
+
+class IndiceAccesorios:
+    """Autómata Aho-Corasick sobre las claves del diccionario de accesorios.
+
+    Reproduce exactamente `clave.upper() in descripcion.upper()` para todas las
+    claves a la vez, incluidas las que son prefijo de otras (AK200TT / AK200TT Rally).
+    """
+
+    def __init__(self, catalogo: List[dict], memo_max: int = 65536):
+        self.catalogo = catalogo
+        claves = []
+        for item in catalogo:
+            clave = item["clave"].upper()
+            if clave not in claves: claves.append(clave)
+        self._entradas_por_clave = [
+            [i for i, item in enumerate(catalogo) if item["clave"].upper() == clave] for clave in claves
+        ]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fallo = [0]
+        self._salidas: List[List[int]] = [[]]
+        for k, clave in enumerate(claves):
+            nodo = 0
+            for ch in clave:
+                sig = self._goto[nodo].get(ch)
+                if sig is None:
+                    sig = len(self._goto)
+                    self._goto.append({}); self._fallo.append(0); self._salidas.append([])
+                    self._goto[nodo][ch] = sig
+                nodo = sig
+            self._salidas[nodo].append(k)
+        cola = deque(self._goto[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for ch, sig in self._goto[nodo].items():
+                f = self._fallo[nodo]
+                while f and ch not in self._goto[f]: f = self._fallo[f]
+                self._fallo[sig] = self._goto[f].get(ch, 0)
+                self._salidas[sig] = self._salidas[sig] + self._salidas[self._fallo[sig]]
+                cola.append(sig)
+        # Las descripciones se repiten entre informes: LRU acotada para no crecer con cada referencia nueva
+        self.coincidencias = functools.lru_cache(maxsize=memo_max)(self._coincidencias)
+
+    def _coincidencias(self, descripcion: str) -> Tuple[int, ...]:
+        """Índices del catálogo cuya clave aparece en la descripción, en orden del catálogo."""
+        encontradas, nodo = set(), 0
+        for ch in descripcion.upper():
+            while nodo and ch not in self._goto[nodo]: nodo = self._fallo[nodo]
+            nodo = self._goto[nodo].get(ch, 0)
+            encontradas.update(self._salidas[nodo])
+        return tuple(sorted(i for k in encontradas for i in self._entradas_por_clave[k]))
+
+    def conteo(self, descripciones: pd.Series) -> pd.DataFrame:
+        """Tabla de accesorios a despachar para las motos con esas descripciones.
+
+        Mismo orden y cantidades que recorrer moto por moto el catálogo completo.
+        """
+        codigos, unicas = pd.factorize(descripciones.astype(str))
+        cant_por_desc = np.bincount(codigos, minlength=len(unicas))
+        pares = [(j, i) for j, d in enumerate(unicas) for i in self.coincidencias(d)]
+        if not pares:
+            return pd.DataFrame(columns=["Número de artículo", "Descripción", "Cantidad a despachar"])
+        orden, entradas = map(list, zip(*pares))
+        df = pd.DataFrame({
+            "Número de artículo": [self.catalogo[i]["ref"] for i in entradas],
+            "Descripción": [self.catalogo[i]["desc"] for i in entradas],
+            "Cantidad a despachar": cant_por_desc[orden],
+        })
+        return df.groupby("Número de artículo", sort=False, as_index=False).agg(
+            {"Descripción": "first", "Cantidad a despachar": "sum"})
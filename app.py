@@ -1,13 +1,84 @@
-from flask import Flask, render_template, request, redirect, url_for, session, send_file
-import pandas as pd
+from __future__ import annotations
+from flask import Flask, render_template, request, redirect, url_for, session, send_file, jsonify, Response, g
 from collections import Counter
-import os, io, uuid
-from typing import List, Tuple
+import importlib, os, time, uuid, zlib
+from accesorios import IndiceAccesorios
+from ingesta import leer_informe, ColumnasFaltantes
+from inventario import guardar_inventario, cargar_inventario, borrar_archivos_usuario, version_actual, CacheInventarios
+from fusion import base_de_informe, fusionar
+from cola import IndiceReferencias, leer_vehiculos, validar_vehiculos
+from limpieza import Conserje
+from sesiones import AlmacenSQLite, CacheLRU, InterfazSesionServidor
+from trabajos import GestorTrabajos
+from exportador import LibroPlaneador, LibrosZip, PoolLibros, archivo_temporal, leer_por_bloques
+from planes import CachePlanes, huellas_cola, huellas_globales, pasos_desde, planear
+from asignacion_global import planear_global
+from metricas import (REGISTRO, Medidor, PETICION_SEG, etapa, iniciar_medicion, terminar_medicion,
+                      iniciar_perfil, guardar_perfil)
+from perezoso import Perezoso
+# pandas/numpy se importan en el primer uso (ver precargar())
+pd = Perezoso("pandas", globals())
+np = Perezoso("numpy", globals())
 
 app = Flask(__name__)
 app.secret_key = "gilberto_clave_super_secreta"
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Inventarios ya abiertos en este proceso, por usuario y versión
+CACHE_INVENTARIOS = CacheInventarios(UPLOAD_FOLDER, int(os.environ.get("INVENTARIO_CACHE_MB", "256")) * 2**20)
+def _borrar_usuario(user_id):
+    CACHE_INVENTARIOS.olvidar(user_id)
+    borrar_archivos_usuario(UPLOAD_FOLDER, user_id)
+# Sesiones del lado del servidor: la cookie solo lleva el id
+SESION_TTL_SEG = int(os.environ.get("SESION_TTL_SEG", str(12 * 3600)))
+app.session_interface = InterfazSesionServidor(
+    CacheLRU(AlmacenSQLite(os.path.join(UPLOAD_FOLDER, "_sesiones.sqlite3"))), SESION_TTL_SEG,
+    al_expirar=lambda datos: _borrar_usuario(datos.get("user_id")))
+# Limpieza en segundo plano de uploads/: sesiones vencidas y archivos huérfanos sin uso por más de ARCHIVOS_TTL_SEG
+CONSERJE = Conserje(UPLOAD_FOLDER, int(os.environ.get("ARCHIVOS_TTL_SEG", str(2 * SESION_TTL_SEG))),
+                    int(os.environ.get("LIMPIEZA_CADA_SEG", "600")),
+                    antes_de_barrer=app.session_interface.purgar_expiradas)
+REGISTRO.agregar(Medidor("planer_cache_inventarios_aciertos_total", "Inventarios servidos desde memoria",
+                         lambda: CACHE_INVENTARIOS.aciertos, "counter"))
+REGISTRO.agregar(Medidor("planer_cache_inventarios_fallos_total", "Inventarios abiertos desde disco",
+                         lambda: CACHE_INVENTARIOS.fallos, "counter"))
+REGISTRO.agregar(Medidor("planer_cache_inventarios_bytes", "Bytes de inventarios retenidos en memoria",
+                         lambda: CACHE_INVENTARIOS.bytes))
+REGISTRO.agregar(Medidor("planer_limpieza_archivos_borrados_total", "Archivos o carpetas borrados de uploads/ por TTL",
+                         lambda: CONSERJE.archivos_borrados, "counter"))
+REGISTRO.agregar(Medidor("planer_limpieza_bytes_recuperados_total", "Bytes liberados en uploads/ por TTL",
+                         lambda: CONSERJE.bytes_recuperados, "counter"))
+# Generación de planeadores en segundo plano
+def _borrar_resultado(trabajo):
+    if trabajo.resultado and os.path.exists(trabajo.resultado): os.remove(trabajo.resultado)
+GESTOR_TRABAJOS = GestorTrabajos(max_workers=int(os.environ.get("PLAN_WORKERS", "2")), al_descartar=_borrar_resultado)
+# Presupuesto del optimizador por vehículo (gunicorn corre con --timeout 120)
+PRESUPUESTO_VEHICULO_SEG = float(os.environ.get("PRESUPUESTO_VEHICULO_SEG", "2"))
+MAX_CELDAS_DP = int(os.environ.get("MAX_CELDAS_DP", "5000000"))
+# Asignaciones ya calculadas (previa y generación con la misma cola e inventario comparten resultado)
+CACHE_PLANES = CachePlanes(int(os.environ.get("PLAN_CACHE_MB", "64")) * 2**20)
+REGISTRO.agregar(Medidor("planer_cache_planes_aciertos_total", "Planes servidos desde la caché",
+                         lambda: CACHE_PLANES.aciertos, "counter"))
+REGISTRO.agregar(Medidor("planer_cache_planes_parciales_total", "Planes reanudados desde un punto de control",
+                         lambda: CACHE_PLANES.parciales, "counter"))
+REGISTRO.agregar(Medidor("planer_cache_planes_fallos_total", "Planes calculados desde cero",
+                         lambda: CACHE_PLANES.fallos, "counter"))
+REGISTRO.agregar(Medidor("planer_cache_planes_pasos_reutilizados_total", "Vehículos cuya asignación salió de la caché",
+                         lambda: CACHE_PLANES.pasos_reutilizados, "counter"))
+REGISTRO.agregar(Medidor("planer_cache_planes_bytes", "Bytes de pasos de plan retenidos en memoria",
+                         lambda: CACHE_PLANES.bytes))
+# Asignación: "secuencial" (cada vehículo en orden de cola) o "global" (toda la cola a la vez, con límite de tiempo)
+ASIGNACION_POR_DEFECTO = os.environ.get("ASIGNACION", "secuencial")
+PLAN_GLOBAL_SEG = float(os.environ.get("PLAN_GLOBAL_SEG", "10"))
+# Procesos que escriben los libros por vehículo de la salida ZIP
+POOL_LIBROS = PoolLibros(int(os.environ.get("LIBROS_PROCESOS", str(min(4, os.cpu_count() or 1)))))
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CACHE_INFORMES = os.path.join(UPLOAD_FOLDER, "_informes")
+# Columnas del informe de reserva que usa el planeador (lo demás no se lee)
+COLUMNAS_REPORTE = ["Nom PV", "No Ped", "Descr", "Descr EXXIT", "Dirección 1", "Clnt Envío", "ID Prod", "Descripcion", "ID Serie", "Estado Satf", "COD INT", "Reserva"]
+# Perfilado con cProfile: solo si PERFILADO=1 y la petición trae ?perfil=1
+PERFILADO = os.environ.get("PERFILADO", "0") == "1"
+CARPETA_PERFILES = os.path.join(UPLOAD_FOLDER, "_perfiles")
 
 # 1. USUARIOS
 USUARIOS_AUTORIZADOS = {"admin": "1234", "gilberto": "akt2025", "logistica": "akt01"}
@@ -70,54 +141,140 @@ DICCIONARIO_ACCESORIOS = [
     {"ref": "7700149213479", "desc": "Retrovisor Der 300Rally Mp", "clave": "Moto VOGE300Rally"}
 ]
 
+INDICE_ACCESORIOS = IndiceAccesorios(DICCIONARIO_ACCESORIOS)
+
 def get_equivalencia(cod_int: str) -> int:
     if pd.isna(cod_int) or str(cod_int).strip() == "": return 1
     return equivalencias.get(str(cod_int).strip().upper(), 1)
 
+def _perfil_pedido() -> bool:
+    return PERFILADO and request.args.get("perfil") == "1"
+
+@app.before_request
+def _arrancar_conserje():
+    CONSERJE.asegurar()
+
+@app.before_request
+def _iniciar_medicion():
+    g.inicio, g.medicion = time.perf_counter(), iniciar_medicion()
+    g.perfil = iniciar_perfil() if _perfil_pedido() else None
+
+@app.after_request
+def _cerrar_medicion(resp):
+    m = g.pop("medicion", None)
+    if m is None: return resp
+    if g.perfil is not None:
+        # Al cliente solo el nombre del archivo; la ruta completa queda en el log del servidor
+        ruta = guardar_perfil(g.perfil, CARPETA_PERFILES, request.endpoint or "sin_ruta")
+        app.logger.info("Perfil de %s: %s", request.path, ruta)
+        resp.headers["X-Perfil"] = os.path.basename(ruta)
+    resp.headers["Server-Timing"] = m.server_timing()
+    terminar_medicion(m)
+    PETICION_SEG.observar(time.perf_counter() - g.inicio, ruta=request.url_rule.rule if request.url_rule else "sin_ruta",
+                          metodo=request.method)
+    return resp
+
+@app.route("/metrics")
+def metricas():
+    return Response(REGISTRO.exponer(), mimetype="text/plain; version=0.0.4")
+
+def _pesos_equivalencia(cod_int: pd.Series) -> np.ndarray:
+    # Igual que get_equivalencia fila a fila, pero normalizando solo los valores distintos
+    codigos, unicos = pd.factorize(cod_int)
+    if len(unicos) == 0: return np.ones(len(cod_int), dtype=np.int8)
+    norm = pd.Series(np.asarray(unicos, dtype=object)).astype(str).str.strip().str.upper()
+    pesos = norm.map(equivalencias).fillna(1).to_numpy(dtype=np.int8)
+    return np.where(codigos < 0, np.int8(1), pesos[codigos])
+
 def _excel_safe_sheet_name(name: str) -> str:
     safe = (name or "SIN_PLACA").replace("/", "-").replace("\\", "-")
     return safe[:31]
 
-def _knapsack_max_peso_min_items(items: List[dict], capacidad: int) -> Tuple[List[int], int]:
-    dp = [(0, 0)] * (capacidad + 1)
-    sel = [[] for _ in range(capacidad + 1)]
-    for item in items:
-        w = item["peso"]
-        for c in range(capacidad, w - 1, -1):
-            cand = (dp[c - w][0] + w, dp[c - w][1] - 1)
-            if cand > dp[c]:
-                dp[c] = cand
-                sel[c] = sel[c - w] + [item["id"]]
-    best_c = max(range(capacidad + 1), key=lambda x: dp[x])
-    return sel[best_c], dp[best_c][0]
-
-def _actualizar_estado_inventario(df, user_id):
-    df.to_pickle(os.path.join(UPLOAD_FOLDER, f"{user_id}_datos.pkl"))
+def _agregado_inventario(df):
+    # Una sola pasada: unidades y peso por (ciudad, COD INT), en orden de aparición
+    g = df.groupby([df["Descr EXXIT"].str.upper(), df["COD INT"]], sort=False, dropna=False, observed=True)["peso_espacio"]
+    agg = g.agg(["size", "max"]).reset_index()
+    agg.columns = ["ciudad", "cod_int", "cantidad", "peso"]
+    return agg[agg["ciudad"].notna()]
+
+def _resumen_desde_agregado(agg):
     conteo_det = {}
-    ciudades_list = df["Descr EXXIT"].str.upper().unique()
-    for c in ciudades_list:
-        df_c = df[df["Descr EXXIT"].str.upper() == c]
-        norm = int(len(df_c[df_c["peso_espacio"] == 1]))
-        esp = int(len(df_c[df_c["peso_espacio"] > 1]))
-        conteo_det[c] = {"total": norm + esp, "normales": norm, "especiales": esp}
-    session["conteo_detallado"] = conteo_det
-    session["ciudades_especiales"] = [c for c, v in conteo_det.items() if v["especiales"] > 0]
+    agg = agg.sort_values("ciudad", kind="stable")
+    for ciudad, cant, peso in zip(agg["ciudad"], agg["cantidad"], agg["peso"]):
+        d = conteo_det.setdefault(ciudad, {"total": 0, "normales": 0, "especiales": 0})
+        d["total"] += int(cant)
+        d["normales" if peso == 1 else "especiales"] += int(cant)
     refs = {}
-    for (ciudad, cod), g in df.groupby([df["Descr EXXIT"].str.upper(), "COD INT"]):
+    especiales = agg[agg["cod_int"].notna()].sort_values(["ciudad", "cod_int"])
+    for ciudad, cod, cant in zip(especiales["ciudad"], especiales["cod_int"], especiales["cantidad"]):
         eq = get_equivalencia(cod)
         if eq > 1:
-            refs.setdefault(ciudad, []).append({"cod_int": cod, "cantidad": int(len(g)), "equivalencia": eq})
-    session["referencias_seleccionadas"] = refs
-    
-    session["kpi_fisico"] = session.get("kpi_inv_fisico_estatico", int(len(df)))
-    session["kpi_equivalente"] = int(df["peso_espacio"].sum())
+            refs.setdefault(ciudad, []).append({"cod_int": cod, "cantidad": int(cant), "equivalencia": eq})
+    return conteo_det, refs
+
+def _ajustar_resumen(conteo_det, refs, filas, signo):
+    # Modo incremental: resta (signo -1, despachos o salidas) o suma (signo 1, fusión de un informe)
+    # unidades sin recorrer el inventario completo
+    agg = _agregado_inventario(filas)
+    for ciudad, cod, cant, peso in zip(agg["ciudad"], agg["cod_int"], agg["cantidad"], agg["peso"]):
+        cant = signo * int(cant)
+        d = conteo_det.get(ciudad)
+        if d is None:
+            if signo < 0: continue
+            d = conteo_det[ciudad] = {"total": 0, "normales": 0, "especiales": 0}
+        d["total"] += cant
+        d["normales" if peso == 1 else "especiales"] += cant
+        if d["total"] <= 0: conteo_det.pop(ciudad)
+        lista = refs.get(ciudad, [])
+        if signo > 0 and not pd.isna(cod) and get_equivalencia(cod) > 1 and all(r["cod_int"] != cod for r in lista):
+            lista.append({"cod_int": cod, "cantidad": 0, "equivalencia": get_equivalencia(cod)})
+            refs[ciudad] = lista
+        for r in lista:
+            if r["cod_int"] == cod: r["cantidad"] += cant
+        lista[:] = [r for r in lista if r["cantidad"] > 0]
+        if ciudad in refs and not lista: refs.pop(ciudad)
+    if signo > 0:  # mismo orden que el resumen completo
+        conteo_det = dict(sorted(conteo_det.items()))
+        refs = {c: sorted(lista, key=lambda r: r["cod_int"]) for c, lista in sorted(refs.items())}
+    return conteo_det, refs
+
+def _actualizar_estado_inventario(df, user_id, removidas=None, sesion=None, agregadas=None):
+    # `sesion` permite aplicar el resultado fuera de una petición (trabajos en segundo plano)
+    sesion = session if sesion is None else sesion
+    with etapa("guardar_inventario"):
+        guardar_inventario(df, UPLOAD_FOLDER, user_id)
+        CACHE_INVENTARIOS.olvidar(user_id)  # las versiones anteriores ya no se vuelven a pedir
+    with etapa("resumen_inventario"):
+        _resumir_en_sesion(sesion, df, removidas, agregadas)
+
+def _resumir_en_sesion(sesion, df, removidas, agregadas=None):
+    if (removidas is not None or agregadas is not None) and "conteo_detallado" in sesion:
+        conteo_det, refs = dict(sesion["conteo_detallado"]), dict(sesion.get("referencias_seleccionadas", {}))
+        kpi_e = sesion.get("kpi_equivalente", 0)
+        if removidas is not None:
+            conteo_det, refs = _ajustar_resumen(conteo_det, refs, removidas, -1)
+            kpi_e -= int(removidas["peso_espacio"].sum())
+        if agregadas is not None:
+            conteo_det, refs = _ajustar_resumen(conteo_det, refs, agregadas, 1)
+            kpi_e += int(agregadas["peso_espacio"].sum())
+        sesion["kpi_equivalente"] = kpi_e
+    else:
+        conteo_det, refs = _resumen_desde_agregado(_agregado_inventario(df))
+        sesion["kpi_equivalente"] = int(df["peso_espacio"].sum())
+    sesion["conteo_detallado"] = conteo_det
+    sesion["ciudades_especiales"] = [c for c, v in conteo_det.items() if v["especiales"] > 0]
+    sesion["referencias_seleccionadas"] = refs
+    sesion["kpi_fisico"] = sesion.get("kpi_inv_fisico_estatico", int(len(df)))
+    sesion["version_inventario"] = sesion.get("version_inventario", 0) + 1  # ETag de los endpoints JSON
 
 @app.route("/", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         user, password = request.form.get("usuario"), request.form.get("contrasena")
         if user in USUARIOS_AUTORIZADOS and USUARIOS_AUTORIZADOS[user] == password:
+            _borrar_usuario(session.get("user_id"))
             session.clear()
+            session.rotar()
             session["usuario"], session["user_id"] = user, str(uuid.uuid4())
             session["vehiculos"] = []
             session["kpi_viajes"] = 0
@@ -131,6 +288,7 @@ def login():
 
 @app.route("/logout")
 def logout():
+    _borrar_usuario(session.get("user_id"))
     session.clear()
     return redirect(url_for("login"))
 
@@ -151,14 +309,42 @@ def dashboard():
 @app.route("/upload", methods=["POST"])
 def upload():
     file = request.files["file"]
-    df = pd.read_excel(file)
-    df = df[df["Estado Satf"] == 40].copy()
-    df["Reserva"] = pd.to_datetime(df["Reserva"], errors="coerce")
-    df["peso_espacio"] = df["COD INT"].apply(get_equivalencia)
-    session["kpi_inv_fisico_estatico"] = int(len(df))
-    session["total_equivalente_inicial"] = int(df["peso_espacio"].sum())
-    _actualizar_estado_inventario(df, session['user_id'])
-    session["mensaje"] = "✅ Archivo analizado"
+    try:
+        with etapa("lectura_informe"):
+            df = leer_informe(file.read(), COLUMNAS_REPORTE, CACHE_INFORMES)
+    except ColumnasFaltantes as e:
+        session["mensaje"] = f"❌ Faltan columnas en el informe: {', '.join(e.args[0])}"
+        return redirect(url_for("dashboard"))
+    with etapa("pesos_equivalencia"):
+        df["peso_espacio"] = _pesos_equivalencia(df["COD INT"])
+    user_id = session['user_id']
+    fusion = None
+    if request.form.get("modo") == "fusionar":
+        with etapa("fusion_informe"):
+            _, vivo = CACHE_INVENTARIOS.cargar(user_id, COLUMNAS_REPORTE + ["peso_espacio"])
+            base = cargar_inventario(UPLOAD_FOLDER, f"{user_id}_base")
+            if vivo is not None and base is None:
+                session["mensaje"] = "❌ No hay informe anterior con qué fusionar: cargue el informe completo"
+                return redirect(url_for("dashboard"))
+            if vivo is not None: fusion = fusionar(vivo, base, df, COLUMNAS_REPORTE)
+    if fusion is None:
+        session["kpi_inv_fisico_estatico"] = int(len(df))
+        session["total_equivalente_inicial"] = int(df["peso_espacio"].sum())
+        _actualizar_estado_inventario(df, user_id)
+        with etapa("base_fusion"):
+            guardar_inventario(base_de_informe(df, COLUMNAS_REPORTE), UPLOAD_FOLDER, f"{user_id}_base")
+        session["mensaje"] = "✅ Archivo analizado"
+    else:
+        session["kpi_inv_fisico_estatico"] = session.get("kpi_inv_fisico_estatico", 0) + fusion.delta_fisico
+        session["total_equivalente_inicial"] = session.get("total_equivalente_inicial", 0) + fusion.delta_equivalente
+        _actualizar_estado_inventario(fusion.inventario, user_id, removidas=fusion.removidas, agregadas=fusion.agregadas)
+        with etapa("base_fusion"):
+            guardar_inventario(fusion.base, UPLOAD_FOLDER, f"{user_id}_base")
+        session["mensaje"] = (f"✅ Informe fusionado: +{fusion.nuevas} nuevas, −{fusion.salientes} salieron de "
+                              f"estado 40, {fusion.actualizadas} actualizadas")
+    if request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json":
+        return jsonify({"modo": "completo" if fusion is None else "fusion",
+                        "delta": None if fusion is None else fusion.a_dict(), "filas": int(len(df))})
     return redirect(url_for("dashboard"))
 
 @app.route("/registrar_vehiculo", methods=["POST"])
@@ -166,16 +352,7 @@ def registrar_vehiculo():
     v_list = session.get("vehiculos", [])
     ciudades_input = [c.strip().upper() for c in request.form["ciudades"].split(",")]
     refs_ids = request.form.getlist("refs_especiales")
-    resumen_visual = []
-    referencias_data = session.get("referencias_seleccionadas", {})
-    for ciudad, lista_refs in referencias_data.items():
-        if ciudad in ciudades_input:
-            for r in lista_refs:
-                if f"{ciudad}_{r['cod_int']}" in refs_ids:
-                    resumen_visual.append({
-                        "ciudad": ciudad, "nombre": r['cod_int'],
-                        "cant": r['cantidad'], "peso_total": r['cantidad'] * r['equivalencia']
-                    })
+    resumen_visual = IndiceReferencias(session.get("referencias_seleccionadas", {})).resumen(ciudades_input, refs_ids)
     v_list.append({
         "transportadora": request.form["transportadora"],
         "conductor": request.form["conductor"],
@@ -189,6 +366,48 @@ def registrar_vehiculo():
     })
     session["kpi_viajes"] = session.get("kpi_viajes", 0) + 1
     session["vehiculos"], session.modified, session["mensaje"] = v_list, True, "✅ Vehículo agregado"
+    _tocar_cola()
+    return redirect(url_for("dashboard"))
+
+@app.route("/vehiculos/importar", methods=["POST"])
+def importar_vehiculos():
+    # Cola completa de una vez: JSON (lista o {"vehiculos": [...]}) o archivo CSV/xlsx en `file`
+    if "user_id" not in session: return jsonify({"error": "sesión no iniciada"}), 401
+    como_json = request.is_json or \
+        request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json"
+    try:
+        if request.is_json:
+            filas = request.get_json(silent=True)
+            if isinstance(filas, dict): filas = filas.get("vehiculos")
+            if not isinstance(filas, list): raise ValueError("se esperaba una lista de vehículos")
+        else:
+            archivo = request.files["file"]
+            filas = leer_vehiculos(archivo.read(), archivo.filename or "")
+    except ColumnasFaltantes as e:
+        error = f"Faltan columnas: {', '.join(e.args[0])}"
+    except Exception as e:
+        error = f"No se pudo leer la cola: {e}"
+    else:
+        error = None
+    if error is not None:
+        if como_json: return jsonify({"error": error}), 400
+        session["mensaje"] = f"❌ {error}"
+        return redirect(url_for("dashboard"))
+    with etapa("validar_cola"):
+        indice = IndiceReferencias(session.get("referencias_seleccionadas", {}))
+        nuevos, errores = validar_vehiculos(filas, indice, session.get("conteo_detallado", {}))
+    if nuevos:
+        session["vehiculos"] = session.get("vehiculos", []) + nuevos
+        session["kpi_viajes"] = session.get("kpi_viajes", 0) + len(nuevos)
+        _tocar_cola()
+    if not request.is_json:  # en CSV/xlsx la fila 1 es el encabezado
+        for e in errores: e["fila"] += 1
+    if como_json:
+        return jsonify({"agregados": len(nuevos), "filas": len(filas), "errores": errores,
+                        "version": session.get("version_cola", 0)})
+    detalle = "; ".join(f"fila {e['fila']}: {', '.join(e['errores'])}" for e in errores[:5])
+    session["mensaje"] = f"✅ Vehículos agregados: {len(nuevos)}" + (
+        f" | ❌ {len(errores)} filas con errores: {detalle}{' …' if len(errores) > 5 else ''}" if errores else "")
     return redirect(url_for("dashboard"))
 
 @app.route("/editar_vehiculo", methods=["POST"])
@@ -204,6 +423,7 @@ def editar_vehiculo():
         v_list[indice]["modo_carga"] = request.form.get("modo_carga")
         session["vehiculos"] = v_list
         session.modified = True
+        _tocar_cola()
     return redirect(url_for("dashboard"))
 
 @app.route("/eliminar_vehiculo/<int:indice>")
@@ -213,12 +433,14 @@ def eliminar_vehiculo(indice):
         v_list.pop(indice)
         session["kpi_viajes"] = max(0, session.get("kpi_viajes", 0) - 1)
     session["vehiculos"], session.modified = v_list, True
+    _tocar_cola()
     return redirect(url_for("dashboard"))
 
 @app.route("/limpiar_cola")
 def limpiar_cola():
     session["vehiculos"] = []
     session.modified = True
+    _tocar_cola()
     return redirect(url_for("dashboard"))
 
 @app.route("/reset_kpis")
@@ -231,92 +453,312 @@ def reset_kpis():
     session["mensaje"] = "♻️ KPIs Reiniciados"
     return redirect(url_for("dashboard"))
 
-@app.route("/generar_planeador", methods=["POST"])
-def generar_planeador():
-    df_path = os.path.join(UPLOAD_FOLDER, f"{session.get('user_id')}_datos.pkl")
-    if not os.path.exists(df_path): return "Error", 400
-    df_pend = pd.read_pickle(df_path)
-    vehiculos_usr = session.get("vehiculos", [])
-    output = io.BytesIO()
-    columnas = ["Nom PV", "No Ped", "Descr", "Descr EXXIT", "Dirección 1", "Clnt Envío", "ID Prod", "Descripcion", "ID Serie", "Estado Satf", "COD INT", "Reserva"]
+def _tocar_cola(sesion=None):
+    sesion = session if sesion is None else sesion
+    sesion["version_cola"] = sesion.get("version_cola", 0) + 1  # ETag de /vehiculos
+
+def _json_versionado(tipo, version, construir):
+    # ETag = usuario + contador de versión + parámetros de la consulta: sin cambios responde 304 sin armar el JSON
+    etag = f"{tipo}-{session['user_id']}-{version}-{zlib.crc32(request.query_string):08x}"
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+    else:
+        resp = jsonify({"version": version, **construir()})
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+def _filtro_ciudades():
+    # ?ciudad=CALI,BUGA (o ?ciudad=CALI&ciudad=BUGA); None = todas
+    pedidas = [c.strip().upper() for v in request.args.getlist("ciudad") for c in v.split(",") if c.strip()]
+    return set(pedidas) or None
+
+def _paginar(items):
+    try:
+        pagina = max(1, int(request.args.get("pagina", 1)))
+        por_pagina = min(500, max(1, int(request.args.get("por_pagina", 50))))
+    except ValueError:
+        pagina, por_pagina = 1, 50
+    inicio = (pagina - 1) * por_pagina
+    return {"total": len(items), "pagina": pagina, "por_pagina": por_pagina,
+            "items": items[inicio:inicio + por_pagina]}
+
+@app.route("/inventario/resumen")
+def resumen_json():
+    if "user_id" not in session: return jsonify({"error": "sesión no iniciada"}), 401
+    def construir():
+        filtro, especiales = _filtro_ciudades(), set(session.get("ciudades_especiales", []))
+        ciudades = [{"ciudad": c, **d, "con_especiales": c in especiales}
+                    for c, d in session.get("conteo_detallado", {}).items() if filtro is None or c in filtro]
+        return {"kpi_fisico": session.get("kpi_fisico", 0), "kpi_equivalente": session.get("kpi_equivalente", 0),
+                **_paginar(ciudades)}
+    return _json_versionado("resumen", session.get("version_inventario", 0), construir)
+
+@app.route("/inventario/referencias")
+def referencias_json():
+    if "user_id" not in session: return jsonify({"error": "sesión no iniciada"}), 401
+    def construir():
+        filtro = _filtro_ciudades()
+        refs = [{"ciudad": c, "id": f"{c}_{r['cod_int']}", **r}
+                for c, lista in session.get("referencias_seleccionadas", {}).items()
+                if filtro is None or c in filtro for r in lista]
+        return _paginar(refs)
+    return _json_versionado("referencias", session.get("version_inventario", 0), construir)
+
+@app.route("/vehiculos")
+def vehiculos_json():
+    if "user_id" not in session: return jsonify({"error": "sesión no iniciada"}), 401
+    def construir():
+        filtro = _filtro_ciudades()
+        cola = [{"indice": i, **v} for i, v in enumerate(session.get("vehiculos", []))
+                if filtro is None or filtro.intersection(v["ciudades"])]
+        return _paginar(cola)
+    return _json_versionado("cola", session.get("version_cola", 0), construir)
+
+def _modo_asignacion():
+    modo = request.values.get("asignacion", ASIGNACION_POR_DEFECTO)
+    return modo if modo in ("secuencial", "global") else ASIGNACION_POR_DEFECTO
+
+def _plan_global_con_cache(df, user_id, version, vehiculos_usr):
+    huellas = huellas_globales(vehiculos_usr)
+    pasos = CACHE_PLANES.prefijo(user_id, version, huellas)
+    if len(pasos) == len(huellas): return [p.asignacion for p in pasos], CACHE_PLANES.nota(user_id, version, huellas[-1])
+    res = planear_global(df, vehiculos_usr, PLAN_GLOBAL_SEG, PRESUPUESTO_VEHICULO_SEG, MAX_CELDAS_DP)
+    comparacion = {"secuencial": res.secuencial.a_dict(), "global": res.global_.a_dict()}
+    app.logger.info("Asignación global (%s vehículos): %s", len(vehiculos_usr), comparacion)
+    CACHE_PLANES.guardar(user_id, version, list(zip(huellas, pasos_desde(df, res.plan))))
+    CACHE_PLANES.anotar(user_id, version, huellas[-1], comparacion)
+    return res.plan, comparacion
+
+def _plan_con_cache(df, user_id, version, vehiculos_usr, asignacion="secuencial"):
+    # Misma entrada (versión del inventario + cola) => misma asignación: la previa y la generación la comparten.
+    # Si solo cambió el vehículo k (edición o eliminación), se reanuda desde el punto de control k-1.
+    if asignacion == "global" and vehiculos_usr:
+        plan, _ = _plan_global_con_cache(df, user_id, version, vehiculos_usr)
+        return plan, 0
+    huellas = huellas_cola(vehiculos_usr)
+    pasos = CACHE_PLANES.prefijo(user_id, version, huellas)
+    k = len(pasos)
+    if k < len(vehiculos_usr):
+        removidas = pasos[-1].mascara(len(df)) if pasos else None
+        plan = planear(df, vehiculos_usr[k:], PRESUPUESTO_VEHICULO_SEG, MAX_CELDAS_DP, removidas)
+        nuevos = pasos_desde(df, plan, removidas)
+        CACHE_PLANES.guardar(user_id, version, list(zip(huellas[k:], nuevos)))
+        pasos = pasos + nuevos
+    return [p.asignacion for p in pasos], k
+
+def _escribir_plan(df, vehiculos_usr, plan, destino, progreso=None):
+    # Escribe el libro en `destino` (ruta, o un LibrosZip para un libro por hoja) a partir de un plan
+    # ya calculado sobre `df`. `progreso(pos, v, resumen)` se llama al terminar cada vehículo.
+    columnas = COLUMNAS_REPORTE
 
     total_despacho_fisico = 0
     total_despacho_equivalente = 0
     ciudades_acumuladas = []
+    despachadas = []
+    procesados = []
 
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        for v in vehiculos_usr:
-            cap, modo, permitidas = v["cantidad_motos"], v["modo_carga"], v["refs_permitidas"]
-            posibles = df_pend[df_pend["Descr EXXIT"].str.upper().isin(v["ciudades"])].copy()
-            posibles = posibles.sort_values(["Reserva", "Dirección 1"])
-            def permitido(r):
-                if modo == "normales" and r["peso_espacio"] > 1: return False
-                if modo == "especiales" and r["peso_espacio"] == 1: return False
-                if r["peso_espacio"] > 1:
-                    return f"{r['Descr EXXIT'].upper()}_{r['COD INT']}" in permitidas
-                return True
-            posibles = posibles[posibles.apply(permitido, axis=1)]
-            grupos = posibles.groupby("Dirección 1").agg(peso=("peso_espacio", "sum"), idxs=("peso_espacio", lambda x: list(x.index))).reset_index()
-            items = [{"id": i, "peso": int(r["peso"])} for i, r in grupos.iterrows() if r["peso"] <= cap]
-            ids, peso_final = _knapsack_max_peso_min_items(items, cap)
+    with (LibroPlaneador(destino) if isinstance(destino, str) else destino) as libro:
+        for pos, (v, (filas, sol)) in enumerate(zip(vehiculos_usr, plan)):
+            cap, peso_final = v["cantidad_motos"], sol.peso
             if peso_final > 0:
-                filas = []
-                for gid in ids: filas.extend(grupos.iloc[gid]["idxs"])
-                asignado = df_pend.loc[filas].sort_values(["Reserva", "Dirección 1"])
+                with etapa("asignacion"):
+                    asignado = df.loc[filas].sort_values(["Reserva", "Dirección 1"])
                 
                 total_despacho_fisico += len(asignado)
                 total_despacho_equivalente += peso_final
                 ciudades_acumuladas.extend(asignado["Descr EXXIT"].str.upper().tolist())
                 
-                hoja = _excel_safe_sheet_name(v["placa"])
                 porcentaje = f"{(peso_final / cap) * 100:.1f}%"
-                enc = pd.DataFrame([{
-                    "Transportadora": v["transportadora"], "Conductor": v["conductor"], 
-                    "Placa": v["placa"], "Capacidad": cap, "Ocupado": peso_final, "Carga %": porcentaje
-                }])
-                enc.to_excel(writer, sheet_name=hoja, index=False, startrow=0)
-                asignado[columnas].to_excel(writer, sheet_name=hoja, index=False, startrow=3)
-
+                enc = {
+                    "Transportadora": v["transportadora"], "Conductor": v["conductor"],
+                    "Placa": v["placa"], "Capacidad": cap, "Ocupado": peso_final, "Carga %": porcentaje,
+                    "Modo": sol.modo, "Brecha %": f"{sol.brecha:.1f}%"
+                }
                 # --- LÓGICA DE ACCESORIOS (COLUMNA N) ---
-                conteo_acc = {}
-                for _, moto in asignado.iterrows():
-                    desc_moto = str(moto["Descripcion"]).upper()
-                    for item in DICCIONARIO_ACCESORIOS:
-                        if item["clave"].upper() in desc_moto:
-                            ref_a = item["ref"]
-                            if ref_a not in conteo_acc:
-                                conteo_acc[ref_a] = {"desc": item["desc"], "cant": 0}
-                            conteo_acc[ref_a]["cant"] += 1
-                
-                if conteo_acc:
-                    df_acc = pd.DataFrame([
-                        {"Número de artículo": k, "Descripción": v_acc["desc"], "Cantidad a despachar": v_acc["cant"]}
-                        for k, v_acc in conteo_acc.items()
-                    ])
-                    ws = writer.sheets[hoja]
-                    ws.write(2, 13, "Campo de accesorios", writer.book.add_format({'bold': True, 'font_color': 'blue'}))
-                    df_acc.to_excel(writer, sheet_name=hoja, index=False, startrow=3, startcol=13)
-
-                df_pend = df_pend.drop(asignado.index)
+                with etapa("accesorios"):
+                    df_acc = INDICE_ACCESORIOS.conteo(asignado["Descripcion"])
+                with etapa("escritura_xlsx"):
+                    libro.hoja_vehiculo(_excel_safe_sheet_name(v["placa"]), enc, asignado[columnas], df_acc)
+
+                despachadas.append(asignado)
                 v["procesado"] = True
+                procesados.append(pos)
+
+            if progreso is not None:
+                progreso(pos, v, {"peso": int(peso_final), "capacidad": cap, "modo": sol.modo})
+
+        with etapa("asignacion"):
+            df_pend = df.drop(np.concatenate([a.filas for a in plan])) if plan else df
+        if not df_pend.empty:
+            with etapa("escritura_xlsx"):
+                libro.hoja_tabla("NO_ASIGNADAS", df_pend[columnas])
 
-        if not df_pend.empty: df_pend[columnas].to_excel(writer, sheet_name="NO_ASIGNADAS", index=False)
+    return {
+        "df_pend": df_pend,
+        "removidas": pd.concat(despachadas) if despachadas else df_pend.iloc[:0],
+        "fisico": total_despacho_fisico,
+        "equivalente": total_despacho_equivalente,
+        "ciudades": Counter(ciudades_acumuladas),
+        "procesados": procesados,
+    }
 
-    session["kpi_despacho_f"] = session.get("kpi_despacho_f", 0) + total_despacho_fisico
-    session["kpi_despacho_e"] = session.get("kpi_despacho_e", 0) + total_despacho_equivalente
-    inv_inicial_f = session.get("kpi_inv_fisico_estatico", 0)
+def _aplicar_resultado_plan(sesion, user_id, res):
+    sesion["kpi_despacho_f"] = sesion.get("kpi_despacho_f", 0) + res["fisico"]
+    sesion["kpi_despacho_e"] = sesion.get("kpi_despacho_e", 0) + res["equivalente"]
+    inv_inicial_f = sesion.get("kpi_inv_fisico_estatico", 0)
     if inv_inicial_f > 0:
-        session["kpi_eficiencia"] = int((session["kpi_despacho_f"] / inv_inicial_f) * 100)
-    
-    top5_dict = dict(session.get("kpi_top5", {}))
-    nuevos_conteos = Counter(ciudades_acumuladas)
-    for ciudad, cant in nuevos_conteos.items():
+        sesion["kpi_eficiencia"] = int((sesion["kpi_despacho_f"] / inv_inicial_f) * 100)
+
+    top5_dict = dict(sesion.get("kpi_top5", {}))
+    for ciudad, cant in res["ciudades"].items():
         top5_dict[ciudad] = top5_dict.get(ciudad, 0) + cant
-    session["kpi_top5"] = dict(sorted(top5_dict.items(), key=lambda x: x[1], reverse=True)[:5])
+    sesion["kpi_top5"] = dict(sorted(top5_dict.items(), key=lambda x: x[1], reverse=True)[:5])
+
+    _actualizar_estado_inventario(res["df_pend"], user_id, removidas=res["removidas"], sesion=sesion)
+
+def _aplicador_plan(user_id, version, vehiculos, res):
+    # Resultado de un plan para aplicar fuera de la petición con session_interface.actualizar
+    def aplicar(datos):
+        if version_actual(UPLOAD_FOLDER, user_id) != version:
+            raise ValueError("El inventario cambió durante la generación; vuelva a generar")
+        _aplicar_resultado_plan(datos, user_id, res)
+        cola = datos.get("vehiculos", [])
+        for pos in res["procesados"]:
+            if pos < len(cola) and cola[pos]["placa"] == vehiculos[pos]["placa"]: cola[pos]["procesado"] = True
+        _tocar_cola(datos)
+    return aplicar
+
+def _cargar_para_plan(user_id):
+    # Compartido con otras peticiones vía CACHE_INVENTARIOS: solo lectura
+    with etapa("carga_inventario"):
+        return CACHE_INVENTARIOS.cargar(user_id, COLUMNAS_REPORTE + ["peso_espacio"])
+
+def _conteo_ciudades(df):
+    return {str(c): int(n) for c, n in df["Descr EXXIT"].str.upper().value_counts().items()}
+
+@app.route("/planes/previa")
+def previa_plan():
+    # Solo lectura: no escribe Excel ni toca inventario/KPIs; la generación reutiliza la asignación
+    if "user_id" not in session: return jsonify({"error": "sesión no iniciada"}), 401
+    version, df = _cargar_para_plan(session["user_id"])
+    if df is None: return jsonify({"error": "no hay inventario cargado"}), 400
+    vehiculos, asignacion = session.get("vehiculos", []), _modo_asignacion()
+    extra = {"asignacion": asignacion}
+    if asignacion == "global" and vehiculos:
+        plan, extra["comparacion"] = _plan_global_con_cache(df, session["user_id"], version, vehiculos)
+    else:
+        plan, extra["vehiculos_reutilizados"] = _plan_con_cache(df, session["user_id"], version, vehiculos)
+    salida = []
+    for pos, (v, (filas, sol)) in enumerate(zip(vehiculos, plan)):
+        cap = v["cantidad_motos"]
+        salida.append({"indice": pos, "placa": v["placa"], "capacidad": cap, "ocupado": int(sol.peso),
+                       "carga_pct": round(sol.peso / cap * 100, 1) if cap else 0.0,
+                       "modo": sol.modo, "brecha_pct": round(sol.brecha, 1), "unidades": int(len(filas)),
+                       "ciudades": _conteo_ciudades(df.loc[filas])})
+    restantes = df.drop(np.concatenate([a.filas for a in plan])) if plan else df
+    return jsonify({"version": version, **extra, "vehiculos": salida,
+                    "no_asignadas": {"unidades": int(len(restantes)),
+                                     "equivalente": int(restantes["peso_espacio"].sum()),
+                                     "ciudades": _conteo_ciudades(restantes)}})
 
-    _actualizar_estado_inventario(df_pend, session['user_id'])
+@app.route("/generar_planeador", methods=["POST"])
+def generar_planeador():
+    version, df = _cargar_para_plan(session.get("user_id"))
+    if df is None: return "Error", 400
+    vehiculos = session.get("vehiculos", [])
+    if request.values.get("salida") == "zip": return _generar_zip(df, version, vehiculos)
+    ruta = archivo_temporal()
+    try:
+        plan, _ = _plan_con_cache(df, session["user_id"], version, vehiculos, _modo_asignacion())
+        res = _escribir_plan(df, vehiculos, plan, ruta)
+    except Exception:
+        os.remove(ruta)
+        raise
+    _aplicar_resultado_plan(session, session["user_id"], res)
+    _tocar_cola()  # vehículos marcados como procesados
     session.modified = True
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name="Planeador_AKT_Gilberto.xlsx")
+    return Response(leer_por_bloques(ruta), mimetype=MIME_XLSX, headers={
+        "Content-Disposition": "attachment; filename=Planeador_AKT_Gilberto.xlsx",
+        "Content-Length": str(os.path.getsize(ruta))})
+
+def _generar_zip(df, version, vehiculos):
+    # Un libro por vehículo (y NO_ASIGNADAS) escritos en POOL_LIBROS; el ZIP se envía mientras terminan.
+    # KPIs, inventario y cola se actualizan recién cuando salió el último libro, como en los trabajos:
+    # si un libro falla o el cliente corta la descarga, la sesión queda como estaba.
+    sid, user_id, vehiculos = session.sid, session["user_id"], [dict(v) for v in vehiculos]
+    plan, _ = _plan_con_cache(df, user_id, version, vehiculos, _modo_asignacion())
+    libros = LibrosZip(POOL_LIBROS.ejecutor())
+    res = _escribir_plan(df, vehiculos, plan, libros)
+
+    def bloques():
+        yield from libros.bloques_zip()
+        try:
+            app.session_interface.actualizar(sid, _aplicador_plan(user_id, version, vehiculos, res))
+        except ValueError as e:
+            app.logger.warning("ZIP de %s sin aplicar: %s", user_id, e)
+    return Response(bloques(), mimetype="application/zip",
+                    headers={"Content-Disposition": "attachment; filename=Planeador_AKT_Gilberto.zip"})
+
+def _trabajo_plan(sid, user_id, vehiculos, asignacion="secuencial", perfilar=False):
+    def ejecutar(trabajo):
+        # Los hilos del pool no heredan la medición de la petición: cada trabajo lleva la suya
+        m, perfil = iniciar_medicion(), iniciar_perfil() if perfilar else None
+        try:
+            return _ejecutar_plan(trabajo)
+        finally:
+            trabajo.etapas = {k: round(v * 1000, 1) for k, v in m.etapas.items()}
+            terminar_medicion(m)
+            if perfil is not None:
+                app.logger.info("Perfil del trabajo %s: %s", trabajo.id,
+                                guardar_perfil(perfil, CARPETA_PERFILES, f"plan_{trabajo.id}"))
+
+    def _ejecutar_plan(trabajo):
+        version, df = _cargar_para_plan(user_id)
+        if df is None: raise ValueError("No hay inventario cargado")
+        ruta = os.path.abspath(os.path.join(UPLOAD_FOLDER, f"{user_id}_plan_{trabajo.id}.xlsx"))
+        plan, _ = _plan_con_cache(df, user_id, version, vehiculos, asignacion)
+        res = _escribir_plan(df, vehiculos, plan, ruta,
+                             progreso=lambda pos, v, r: trabajo.avanzar({"placa": v["placa"], **r}))
+        if not app.session_interface.actualizar(sid, _aplicador_plan(user_id, version, vehiculos, res)):
+            raise ValueError("La sesión expiró")
+        return ruta
+    return ejecutar
+
+@app.route("/planes", methods=["POST"])
+def crear_plan():
+    if "user_id" not in session: return jsonify({"error": "sesión no iniciada"}), 401
+    if version_actual(UPLOAD_FOLDER, session["user_id"]) is None: return jsonify({"error": "no hay inventario cargado"}), 400
+    vehiculos = [dict(v) for v in session.get("vehiculos", [])]
+    trabajo = GESTOR_TRABAJOS.enviar(session["user_id"], len(vehiculos),
+                                     _trabajo_plan(session.sid, session["user_id"], vehiculos,
+                                                   _modo_asignacion(), _perfil_pedido()))
+    return jsonify({**trabajo.a_dict(), "url_estado": url_for("estado_plan", trabajo_id=trabajo.id),
+                    "url_descarga": url_for("descargar_plan", trabajo_id=trabajo.id)}), 202
+
+@app.route("/planes/<trabajo_id>")
+def estado_plan(trabajo_id):
+    trabajo = GESTOR_TRABAJOS.obtener(trabajo_id, session.get("user_id"))
+    if trabajo is None: return jsonify({"error": "trabajo no encontrado"}), 404
+    return jsonify(trabajo.a_dict())
+
+@app.route("/planes/<trabajo_id>/descarga")
+def descargar_plan(trabajo_id):
+    trabajo = GESTOR_TRABAJOS.obtener(trabajo_id, session.get("user_id"))
+    if trabajo is None: return jsonify({"error": "trabajo no encontrado"}), 404
+    if trabajo.estado != "terminado": return jsonify(trabajo.a_dict()), 409
+    return send_file(trabajo.resultado, as_attachment=True, download_name="Planeador_AKT_Gilberto.xlsx")
+
+def precargar():
+    """Importa ya las dependencias diferidas y recorre una vez las rutas de pandas de la carga y el resumen.
+
+    gunicorn.conf.py la llama en el proceso maestro con preload_app: los workers nacen con todo importado.
+    """
+    Perezoso.cargar_todos()
+    importlib.import_module("openpyxl")  # lectura del informe (ingesta lo importa dentro de la función)
+    muestra = pd.DataFrame({"Descr EXXIT": ["X"], "COD INT": [next(iter(equivalencias))], "Descripcion": ["X"]})
+    muestra["peso_espacio"] = _pesos_equivalencia(muestra["COD INT"])
+    _resumen_desde_agregado(_agregado_inventario(muestra))
+    INDICE_ACCESORIOS.conteo(muestra["Descripcion"])
 
 if __name__ == "__main__": app.run(debug=True)
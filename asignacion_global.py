@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, List, NamedTuple
+
+from metricas import etapa
+from optimizador import Solucion, resolver_vehiculo
+from perezoso import Perezoso
+from planes import AsignacionVehiculo, mascara_permitidos, planear
+
+np = Perezoso("numpy", globals())
+pd = Perezoso("pandas", globals())
+
+# Asignación conjunta de toda la cola (multi-knapsack). Se parte del plan secuencial y se mejora
+# con búsqueda local hasta agotar el tiempo, así que nunca despacha menos que el modo secuencial.
+#
+# Un "ítem" es el conjunto de filas de una misma `Dirección 1` que admiten exactamente los mismos
+# vehículos (ciudad + modo_carga + refs_permitidas). El modo secuencial tampoco parte un ítem:
+# cuando un vehículo toma una dirección se lleva todas sus filas elegibles.
+
+
+class Comparacion(NamedTuple):
+    unidades: int
+    equivalente: int
+    seg: float
+
+    def a_dict(self) -> dict:
+        return {"unidades": self.unidades, "equivalente": self.equivalente, "seg": round(self.seg, 3)}
+
+
+class ResultadoGlobal(NamedTuple):
+    plan: List[AsignacionVehiculo]
+    secuencial: Comparacion
+    global_: Comparacion
+
+
+def _elegibles(df: pd.DataFrame, vehiculos: List[dict]) -> np.ndarray:
+    # Matriz filas x vehículos con las mismas reglas que el modo secuencial
+    ciudad = df["Descr EXXIT"].str.upper()
+    m = np.zeros((len(df), len(vehiculos)), dtype=bool)
+    for j, v in enumerate(vehiculos):
+        en_ciudad = ciudad.isin(v["ciudades"]).to_numpy()
+        if en_ciudad.any():
+            m[en_ciudad, j] = mascara_permitidos(df[en_ciudad], v["modo_carga"], v["refs_permitidas"])
+    m[df["Dirección 1"].isna().to_numpy()] = False  # el groupby por dirección las descarta
+    return m
+
+
+def _items(df: pd.DataFrame, elegibles: np.ndarray):
+    """(posiciones de filas por ítem, peso por ítem, vehículos compatibles por ítem, ítem de cada fila)."""
+    firmas = np.packbits(elegibles, axis=1)
+    firmas = np.ascontiguousarray(firmas).view(np.dtype((np.void, firmas.shape[1]))).ravel()
+    firma_id = pd.factorize(firmas)[0] if len(firmas) else np.zeros(0, dtype=np.int64)
+    dir_id = pd.factorize(df["Dirección 1"])[0]
+    n_firmas = int(firma_id.max()) + 1 if len(firma_id) else 1
+    clave = dir_id.astype(np.int64) * n_firmas + firma_id
+    clave[~elegibles.any(axis=1)] = -1
+    item_de_fila = np.full(len(df), -1, dtype=np.int64)
+    validas = np.flatnonzero(clave >= 0)
+    unicos, inversa = np.unique(clave[validas], return_inverse=True)
+    item_de_fila[validas] = inversa
+    orden = validas[np.argsort(inversa, kind="stable")]
+    cortes = np.cumsum(np.bincount(inversa, minlength=len(unicos)))[:-1]
+    filas = np.split(orden, cortes) if len(unicos) else []
+    pesos = np.bincount(inversa, weights=df["peso_espacio"].to_numpy()[validas], minlength=len(unicos)).astype(np.int64)
+    compatibles = [np.flatnonzero(elegibles[f[0]]) for f in filas]
+    return filas, pesos, compatibles, item_de_fila
+
+
+def planear_global(df: pd.DataFrame, vehiculos: List[dict], limite_seg: float, presupuesto_seg: float,
+                   max_celdas: int) -> ResultadoGlobal:
+    t0 = time.perf_counter()
+    secuencial = planear(df, vehiculos, presupuesto_seg, max_celdas)
+    t_sec = time.perf_counter() - t0
+    sec = Comparacion(sum(len(a.filas) for a in secuencial), sum(a.sol.peso for a in secuencial), t_sec)
+
+    t1 = time.perf_counter()
+    limite = t1 + limite_seg
+    with etapa("global_items"):
+        filas, pesos, compatibles, item_de_fila = _items(df, _elegibles(df, vehiculos))
+    caps = [int(v["cantidad_motos"]) for v in vehiculos]
+    dueno = np.full(len(pesos), -1, dtype=np.int64)
+    carga = [0] * len(vehiculos)
+    asignados: List[set] = [set() for _ in vehiculos]
+    posicion = df.index.get_indexer  # etiquetas -> posiciones
+    for j, a in enumerate(secuencial):
+        for it in np.unique(item_de_fila[posicion(a.filas)]) if len(a.filas) else ():
+            dueno[it] = j
+            asignados[j].add(int(it))
+        carga[j] = int(a.sol.peso)
+
+    def mover(it, de, a):
+        if de >= 0:
+            asignados[de].discard(it)
+            carga[de] -= int(pesos[it])
+        if a >= 0:
+            asignados[a].add(it)
+            carga[a] += int(pesos[it])
+        dueno[it] = a
+
+    with etapa("global_busqueda"):
+        mejoro = True
+        while mejoro and time.perf_counter() < limite:
+            mejoro = False
+            libres = [i for i in np.argsort(-pesos, kind="stable") if dueno[i] < 0]
+            # 1) Reoptimizar cada vehículo con sus ítems + los libres que admite (exacto por vehículo)
+            for j, cap in enumerate(caps):
+                if time.perf_counter() >= limite: break
+                candidatos = [int(i) for i in libres if dueno[i] < 0 and pesos[i] <= cap and j in compatibles[i]]
+                if not candidatos or carga[j] == cap: continue
+                candidatos += sorted(asignados[j])
+                sol = resolver_vehiculo([{"id": i, "peso": int(pesos[i])} for i in candidatos], cap,
+                                        min(presupuesto_seg, max(0.0, limite - time.perf_counter())), max_celdas)
+                if sol.peso > carga[j]:
+                    nuevos = set(sol.ids)
+                    for it in asignados[j] - nuevos: mover(it, j, -1)
+                    for it in nuevos - asignados[j]: mover(it, -1, j)
+                    mejoro = True
+            # 2) Meter cada libre donde quepa o, si no, reubicar un ítem a otro vehículo compatible para abrirle espacio
+            for u in [i for i in libres if dueno[i] < 0]:
+                if time.perf_counter() >= limite: break
+                directo = next((j for j in compatibles[u] if caps[j] - carga[j] >= pesos[u]), None)
+                if directo is not None:
+                    mover(u, -1, directo)
+                    mejoro = True
+                    continue
+                hecho = False
+                for j in compatibles[u]:
+                    falta = int(pesos[u]) - (caps[j] - carga[j])
+                    if pesos[u] > caps[j] or falta <= 0: continue
+                    for it in sorted(asignados[j], key=lambda i: pesos[i]):
+                        if pesos[it] < falta: continue
+                        destino = next((b for b in compatibles[it] if b != j and caps[b] - carga[b] >= pesos[it]), None)
+                        if destino is None: continue
+                        mover(it, j, destino)
+                        mover(u, -1, j)
+                        hecho = mejoro = True
+                        break
+                    if hecho: break
+
+    indice = df.index.to_numpy()
+    disponible: Dict[int, int] = {}
+    for i, comp in enumerate(compatibles):
+        for j in comp: disponible[j] = disponible.get(j, 0) + int(pesos[i])
+    plan = []
+    for j, cap in enumerate(caps):
+        its = sorted(asignados[j])
+        pos = np.sort(np.concatenate([filas[i] for i in its])) if its else np.zeros(0, dtype=np.int64)
+        cota = min(cap, disponible.get(j, 0))
+        brecha = 0.0 if not cota or carga[j] >= cota else (cota - carga[j]) / cota * 100
+        plan.append(AsignacionVehiculo(indice[pos], Solucion(its, carga[j], "global", brecha)))
+    glo = Comparacion(sum(len(a.filas) for a in plan), sum(carga), sec.seg + time.perf_counter() - t1)
+    return ResultadoGlobal(plan, sec, glo)
@@ -0,0 +1,52 @@
+# Uso: python -m benchmarks [--filas N] [--salida res.json] [--comparar base.json] [--umbral 0.2]
+#
+# Genera un informe sintético, corre los escenarios y guarda los tiempos en JSON para
+# compararlos entre commits. Con --comparar sale con código 1 si algún escenario es más
+# lento que la base por encima del umbral.
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.suite import ESCENARIOS, PARAMETROS_DEFECTO, comparar, ejecutar_suite, guardar
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m benchmarks")
+    for clave, valor in PARAMETROS_DEFECTO.items():
+        ap.add_argument(f"--{clave}", type=int, default=valor)
+    ap.add_argument("--repeticiones", type=int, default=5)
+    ap.add_argument("--escenarios", help=f"separados por coma: {','.join(ESCENARIOS)}")
+    ap.add_argument("--salida", help="ruta del JSON de resultados")
+    ap.add_argument("--comparar", help="JSON de una corrida anterior")
+    ap.add_argument("--umbral", type=float, default=0.2, help="regresión tolerada (0.2 = 20 %%)")
+    args = ap.parse_args(argv)
+
+    nombres = args.escenarios.split(",") if args.escenarios else None
+    desconocidos = [n for n in nombres or [] if n not in ESCENARIOS]
+    if desconocidos: ap.error(f"escenarios desconocidos: {', '.join(desconocidos)}")
+    salida = os.path.abspath(args.salida) if args.salida else None
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+
+    # La app escribe en ./uploads: se trabaja en una carpeta temporal
+    os.chdir(tempfile.mkdtemp(prefix="planer_bench_"))
+    resultado = ejecutar_suite({k: getattr(args, k) for k in PARAMETROS_DEFECTO}, args.repeticiones, nombres)
+    if salida: guardar(resultado, salida)
+
+    if base is not None:
+        if base.get("parametros") != resultado["parametros"]:
+            print("aviso: la base se midió con otros parámetros", file=sys.stderr)
+        regresiones = comparar(base, resultado, args.umbral)
+        for nombre, antes, ahora, razon in regresiones:
+            print(f"REGRESIÓN {nombre}: {antes:.4f} s -> {ahora:.4f} s (x{razon:.2f})")
+        if regresiones: return 1
+        print(f"sin regresiones por encima del {args.umbral:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# Uso: python -m benchmarks.bench_accesorios
+# Compara el índice Aho-Corasick de accesorios contra el recorrido original y falla si difieren.
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from accesorios import IndiceAccesorios
+from app import DICCIONARIO_ACCESORIOS
+from benchmarks.referencia import conteo_accesorios_original
+
+
+def _descripciones(n, seed):
+    r = random.Random(seed)
+    claves = sorted({item["clave"] for item in DICCIONARIO_ACCESORIOS})
+    extras = ["Moto AK200TT Rally ABS", "MOTO ak125flex cbs mlt negra", "Moto AK125CR4 / Moto AK150CR4",
+              "Moto OTRA 2025", "moto hima 452", np.nan, 125]
+    return pd.Series([
+        r.choice(extras) if r.random() < .2 else f"{r.choice(claves)} {r.choice(['Negro', 'Rojo', 'EIII', ''])}"
+        for _ in range(n)
+    ], dtype=object)
+
+
+def _comparable(df):
+    return [tuple(int(x) if isinstance(x, (int, np.integer)) else x for x in fila) for fila in df.itertuples(index=False)]
+
+
+def verificar_equivalencia(casos=200):
+    r = random.Random(3)
+    indice = IndiceAccesorios(DICCIONARIO_ACCESORIOS)
+    for caso in range(casos):
+        asignado = pd.DataFrame({"Descripcion": _descripciones(r.randint(0, 80), caso)})
+        esperado = _comparable(conteo_accesorios_original(asignado, DICCIONARIO_ACCESORIOS))
+        obtenido = _comparable(indice.conteo(asignado["Descripcion"]))
+        if esperado != obtenido:
+            raise AssertionError(f"caso {caso}: {obtenido} != {esperado}")
+
+
+def main():
+    verificar_equivalencia()
+    print("equivalencia OK")
+    print(f"{'motos':>8} {'original s':>12} {'indice s':>10} {'x':>7}")
+    for n in [100, 1000, 10000]:
+        asignado = pd.DataFrame({"Descripcion": _descripciones(n, n)})
+        t0 = time.perf_counter()
+        conteo_accesorios_original(asignado, DICCIONARIO_ACCESORIOS)
+        t_orig = time.perf_counter() - t0
+        indice = IndiceAccesorios(DICCIONARIO_ACCESORIOS)
+        t0 = time.perf_counter()
+        indice.conteo(asignado["Descripcion"])
+        t_nuevo = time.perf_counter() - t0
+        print(f"{n:>8} {t_orig:>12.4f} {t_nuevo:>10.4f} {t_orig / t_nuevo:>7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# Uso: python -m benchmarks.bench_arranque [filas] [repeticiones] [raíz del repo a medir]
+# Arranque en frío: tiempo de `import app` y latencia de las primeras peticiones, cada corrida en un
+# intérprete nuevo. "con precarga" llama antes a app.precargar(), como hace gunicorn.conf.py en el maestro.
+# Pasando la raíz de otra copia del repo (p. ej. un `git worktree` del commit anterior) se mide el antes.
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.generador import a_xlsx, generar_informe
+
+HIJO = r"""
+import json, os, sys, time
+sys.path.insert(0, sys.argv[1])
+t0 = time.perf_counter()
+import app
+r = {"import": time.perf_counter() - t0}
+if sys.argv[3] == "1" and hasattr(app, "precargar"):
+    t0 = time.perf_counter(); app.precargar(); r["precarga"] = time.perf_counter() - t0
+c = app.app.test_client()
+for nombre, fn in [("GET /", lambda: c.get("/")),
+                   ("login", lambda: c.post("/", data={"usuario": "admin", "contrasena": "1234"})),
+                   ("upload", lambda: c.post("/upload", data={"file": (open(sys.argv[2], "rb"), "i.xlsx")},
+                                             content_type="multipart/form-data"))]:
+    t0 = time.perf_counter(); fn(); r[nombre] = time.perf_counter() - t0
+print(json.dumps(r))
+"""
+
+
+def _corrida(raiz, xlsx, precarga):
+    with tempfile.TemporaryDirectory() as tmp:
+        salida = subprocess.run([sys.executable, "-c", HIJO, raiz, xlsx, "1" if precarga else "0"], cwd=tmp,
+                                capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    raiz = os.path.abspath(sys.argv[3]) if len(sys.argv) > 3 else os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as f:
+        f.write(a_xlsx(generar_informe(filas)))
+    try:
+        print(f"raíz: {raiz}  filas: {filas}  repeticiones: {repeticiones}  (medianas, ms)")
+        for precarga in (False, True):
+            corridas = [_corrida(raiz, f.name, precarga) for _ in range(repeticiones)]
+            etapas = [k for k in corridas[0]]
+            print(f"{'con precarga' if precarga else 'sin precarga':<14}" +
+                  "  ".join(f"{k} {statistics.median(c[k] for c in corridas) * 1000:7.1f}" for k in etapas))
+    finally:
+        os.remove(f.name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
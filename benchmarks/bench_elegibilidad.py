@@ -0,0 +1,70 @@
+# Uso: python -m benchmarks.bench_elegibilidad [filas]
+# peso_espacio y filtro de referencias permitidas: versión vectorizada vs apply fila a fila.
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import _pesos_equivalencia, get_equivalencia
+from planes import mascara_permitidos
+from benchmarks.generador import inventario_sintetico
+from benchmarks.referencia import peso_espacio_original, permitidos_original
+
+
+def _cods_dificiles(n, seed):
+    r = random.Random(seed)
+    opciones = ["AK200ZW", " ak200zw ", "ATUL RIK", "atul rik", "300AC", "", "  ", None, np.nan, 300, 300.0,
+                "HIMALAYAN 452", "AK125T-4", "DESCONOCIDO"]
+    return pd.Series([r.choice(opciones) for _ in range(n)], dtype=object)
+
+
+def _permitidas(df, r, fraccion):
+    pares = df.loc[df["peso_espacio"] > 1, ["Descr EXXIT", "COD INT"]].drop_duplicates()
+    return [f"{c.upper()}_{cod}" for c, cod in zip(pares["Descr EXXIT"], pares["COD INT"]) if r.random() < fraccion]
+
+
+def verificar_equivalencia():
+    for seed in range(20):
+        cods = _cods_dificiles(500, seed)
+        esperado = peso_espacio_original(cods, get_equivalencia).to_numpy()
+        if not np.array_equal(esperado, _pesos_equivalencia(cods)):
+            raise AssertionError(f"peso_espacio distinto (semilla {seed})")
+    r = random.Random(1)
+    df = inventario_sintetico(5000)
+    for modo in ("todas", "normales", "especiales"):
+        for fraccion in (0, .5, 1):
+            permitidas = _permitidas(df, r, fraccion)
+            sub = df.sample(frac=.3, random_state=r.randint(0, 99))
+            esperado = permitidos_original(sub, modo, permitidas).to_numpy(dtype=bool)
+            if not np.array_equal(esperado, mascara_permitidos(sub, modo, permitidas)):
+                raise AssertionError(f"filtro distinto (modo={modo}, fraccion={fraccion})")
+
+
+def _medir(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    verificar_equivalencia()
+    print("equivalencia OK")
+    df = inventario_sintetico(filas)
+    permitidas = _permitidas(df, random.Random(2), .5)
+    print(f"filas: {filas}")
+    print(f"{'operación':<28} {'original s':>11} {'vectorizado s':>14} {'x':>7}")
+    t_o = _medir(peso_espacio_original, df["COD INT"], get_equivalencia)
+    t_n = _medir(_pesos_equivalencia, df["COD INT"])
+    print(f"{'peso_espacio':<28} {t_o:>11.4f} {t_n:>14.4f} {t_o / t_n:>7.1f}")
+    for modo in ("todas", "especiales"):
+        t_o = _medir(permitidos_original, df, modo, permitidas)
+        t_n = _medir(mascara_permitidos, df, modo, permitidas)
+        print(f"{'permitidos (' + modo + ')':<28} {t_o:>11.4f} {t_n:>14.4f} {t_o / t_n:>7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
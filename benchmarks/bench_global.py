@@ -0,0 +1,51 @@
+# Uso: python -m benchmarks.bench_global [segundos]
+# Asignación secuencial (orden de cola) vs global (toda la cola a la vez) en varias formas de inventario.
+import sys
+
+import numpy as np
+
+from app import MAX_CELDAS_DP, PRESUPUESTO_VEHICULO_SEG
+from asignacion_global import planear_global
+from benchmarks.generador import inventario_sintetico, vehiculos_sinteticos
+from planes import mascara_permitidos
+
+# (nombre, filas, direcciones, vehículos)
+CASOS = [
+    ("holgado", 20_000, 2_000, 30),
+    ("direcciones grandes", 3_000, 150, 40),
+    ("cola larga", 8_000, 400, 60),
+    ("escaso", 2_000, 100, 30),
+]
+
+
+def _valido(df, cola, plan) -> bool:
+    todas = np.concatenate([a.filas for a in plan]) if plan else np.zeros(0)
+    if len(todas) != len(np.unique(todas)): return False
+    for v, a in zip(cola, plan):
+        sub = df.loc[a.filas]
+        if int(sub["peso_espacio"].astype(int).sum()) != a.sol.peso or a.sol.peso > v["cantidad_motos"]: return False
+        if not sub["Descr EXXIT"].str.upper().isin(v["ciudades"]).all(): return False
+        if not mascara_permitidos(sub, v["modo_carga"], v["refs_permitidas"]).all(): return False
+    return True
+
+
+def main():
+    limite = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    ok = True
+    print(f"{'caso':<22} {'modo':<11} {'unidades':>9} {'equiv.':>8} {'seg':>7}")
+    for nombre, filas, direcciones, vehiculos in CASOS:
+        df = inventario_sintetico(filas, ciudades=20, direcciones=direcciones)
+        cola = vehiculos_sinteticos(df, vehiculos)
+        res = planear_global(df, cola, limite, PRESUPUESTO_VEHICULO_SEG, MAX_CELDAS_DP)
+        valido = _valido(df, cola, res.plan)
+        ok &= valido and res.global_.equivalente >= res.secuencial.equivalente
+        for modo, c in (("secuencial", res.secuencial), ("global", res.global_)):
+            print(f"{nombre:<22} {modo:<11} {c.unidades:>9} {c.equivalente:>8} {c.seg:>7.2f}")
+        mejora = (res.global_.equivalente / res.secuencial.equivalente - 1) * 100 if res.secuencial.equivalente else 0.0
+        print(f"{'':<22} {'mejora':<11} {res.global_.unidades - res.secuencial.unidades:>+9} {mejora:>+7.1f}%"
+              f"{'' if valido else '   ¡ASIGNACIÓN INVÁLIDA!'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
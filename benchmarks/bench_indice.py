@@ -0,0 +1,63 @@
+# Uso: python -m benchmarks.bench_indice [filas] [vehículos]
+# Planeación con índice por ciudad y máscara de asignadas vs filtrar/ordenar/drop por vehículo.
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app import COLUMNAS_REPORTE, MAX_CELDAS_DP, PRESUPUESTO_VEHICULO_SEG
+from benchmarks.generador import inventario_sintetico, vehiculos_sinteticos
+from benchmarks.referencia import planear_original
+from inventario import cargar_inventario, guardar_inventario
+from planes import planear
+
+
+def _iguales(plan, original):
+    return all(np.array_equal(a.filas, f) and a.sol == s for a, (f, s) in zip(plan, original))
+
+
+def verificar_equivalencia():
+    # Inventarios chicos con nulos, ciudades repetidas en la cola y filas ya asignadas
+    r = np.random.default_rng(0)
+    for seed in range(12):
+        df = inventario_sintetico(int(r.integers(200, 3000)), seed, ciudades=int(r.integers(2, 12)),
+                                  direcciones=int(r.integers(20, 300)))
+        cola = vehiculos_sinteticos(df, int(r.integers(3, 15)), seed)
+        df.loc[r.random(len(df)) < 0.03, "Dirección 1"] = np.nan
+        df.loc[r.random(len(df)) < 0.03, "Reserva"] = np.nan
+        df.loc[r.random(len(df)) < 0.02, "Descr EXXIT"] = np.nan
+        df = df.iloc[r.permutation(len(df))]
+        removidas = r.random(len(df)) < 0.1 if seed % 2 else None
+        with tempfile.TemporaryDirectory() as tmp:
+            guardar_inventario(df, tmp, "eq")
+            for datos in (df, cargar_inventario(tmp, "eq", COLUMNAS_REPORTE + ["peso_espacio"])):
+                original = planear_original(datos, cola, PRESUPUESTO_VEHICULO_SEG, MAX_CELDAS_DP, removidas)
+                if not _iguales(planear(datos, cola, PRESUPUESTO_VEHICULO_SEG, MAX_CELDAS_DP, removidas), original):
+                    return False
+    return True
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    cantidad = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    print(f"asignación idéntica a la original: {verificar_equivalencia()}")
+    with tempfile.TemporaryDirectory() as tmp:
+        guardar_inventario(inventario_sintetico(filas, ciudades=40), tmp, "bench")
+        df = cargar_inventario(tmp, "bench", COLUMNAS_REPORTE + ["peso_espacio"])
+        cola = vehiculos_sinteticos(df, cantidad)
+        t0 = time.perf_counter()
+        original = planear_original(df, cola, PRESUPUESTO_VEHICULO_SEG, MAX_CELDAS_DP)
+        t_orig = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        plan = planear(df, cola, PRESUPUESTO_VEHICULO_SEG, MAX_CELDAS_DP)
+        t_ind = time.perf_counter() - t0
+    print(f"filas: {filas}  vehículos: {cantidad}")
+    print(f"{'original (drop por vehículo)':<30} {t_orig:>8.3f} s")
+    print(f"{'índice + máscara':<30} {t_ind:>8.3f} s   x{t_orig / t_ind:.2f}")
+    print(f"mismo resultado: {_iguales(plan, original)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# Uso: python -m benchmarks.bench_inventario [filas]
+# Memoria residente y tiempo de carga del inventario: pickle (formato anterior) vs almacén columnar.
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from app import COLUMNAS_REPORTE
+from benchmarks.generador import inventario_sintetico
+from inventario import guardar_inventario
+
+_CARGA = """
+import json, sys, time
+def rss():
+    with open("/proc/self/statm") as f: return int(f.read().split()[1]) * 4096
+import pandas as pd
+from inventario import cargar_inventario
+antes = rss(); t0 = time.perf_counter()
+if sys.argv[1] == "pickle":
+    df = pd.read_pickle(sys.argv[2])
+else:
+    df = cargar_inventario(sys.argv[2], "bench", sys.argv[3].split("|"))
+t = time.perf_counter() - t0
+df["Descr EXXIT"].str.upper().isin(["CIUDAD 001"]).sum()
+print(json.dumps({"seg": t, "rss_mb": (rss() - antes) / 2**20}))
+"""
+
+
+def _medir(*args):
+    salida = subprocess.run([sys.executable, "-c", _CARGA, *args], capture_output=True, text=True, check=True,
+                            env={**os.environ, "PYTHONPATH": os.getcwd()})
+    return json.loads(salida.stdout)
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    df = inventario_sintetico(filas)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_pkl = os.path.join(tmp, "bench_datos.pkl")
+        df.to_pickle(ruta_pkl)
+        guardar_inventario(df, tmp, "bench")
+        pkl = _medir("pickle", ruta_pkl)
+        col = _medir("columnar", tmp, "|".join(COLUMNAS_REPORTE + ["peso_espacio"]))
+        col_min = _medir("columnar", tmp, "Descr EXXIT|COD INT|peso_espacio")
+        tam_col = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(tmp) for f in fs) - os.path.getsize(ruta_pkl)
+        print(f"filas: {filas}")
+        print(f"{'formato':<24} {'carga s':>8} {'RSS MB':>8} {'disco MB':>9}")
+        print(f"{'pickle':<24} {pkl['seg']:>8.3f} {pkl['rss_mb']:>8.1f} {os.path.getsize(ruta_pkl) / 2**20:>9.1f}")
+        print(f"{'columnar (plan)':<24} {col['seg']:>8.3f} {col['rss_mb']:>8.1f} {tam_col / 2**20:>9.1f}")
+        print(f"{'columnar (3 columnas)':<24} {col_min['seg']:>8.3f} {col_min['rss_mb']:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+# Uso: python -m benchmarks.bench_knapsack
+# Compara knapsack_max_peso_min_items y resolver_vehiculo contra la versión original y falla si difieren.
+import random
+import sys
+import time
+
+from optimizador import knapsack_max_peso_min_items, resolver_vehiculo
+from benchmarks.referencia import knapsack_original
+
+
+def _items(n, seed):
+    r = random.Random(seed)
+    pesos = [1] * 70 + [2] * 20 + [3, 4, 6, 12] * 2 + [7, 9, 15, 40]
+    return [{"id": i, "peso": r.choice(pesos) * r.randint(1, 3)} for i in range(n)]
+
+
+def verificar_equivalencia(casos=300):
+    r = random.Random(7)
+    for caso in range(casos):
+        items = _items(r.randint(0, 60), caso)
+        cap = r.randint(1, 130)
+        esperado = knapsack_original(items, cap)
+        obtenido = knapsack_max_peso_min_items(items, cap)
+        if esperado != obtenido:
+            raise AssertionError(f"caso {caso} (cap={cap}): {obtenido} != {esperado}")
+        sol = resolver_vehiculo(items, cap, 60, 10**9)
+        pesos = {item["id"]: item["peso"] for item in items}
+        if (sol.modo, sol.ids, sol.peso) != ("exacto", sorted(esperado[0]), esperado[1]):
+            raise AssertionError(f"caso {caso} (cap={cap}): resolver_vehiculo {sol} != {esperado}")
+        # Sin celdas para el DP por ítem, el acotado (si cabe) da el mismo peso y número de grupos
+        acot = resolver_vehiculo(items, cap, 60, sol.celdas - 1) if sol.celdas else sol
+        if acot.modo == "exacto" and (acot.peso, len(acot.ids)) != (esperado[1], len(esperado[0])) \
+                or sum(pesos[i] for i in acot.ids) != acot.peso or len(set(acot.ids)) != len(acot.ids):
+            raise AssertionError(f"caso {caso} (cap={cap}): DP acotado {acot} != {esperado}")
+        heur = resolver_vehiculo(items, cap, 0, 0)
+        if (sol.peso and heur.modo != "heuristico") or heur.peso > sol.peso or sum(pesos[i] for i in heur.ids) != heur.peso:
+            raise AssertionError(f"caso {caso} (cap={cap}): heurística inválida {heur}")
+
+
+def _medir(fn, items, cap):
+    t0 = time.perf_counter()
+    fn(items, cap)
+    return time.perf_counter() - t0
+
+
+def _acotado(items, cap):
+    return resolver_vehiculo(items, cap, 60, len(items) * (cap + 1) - 1)
+
+
+def main():
+    verificar_equivalencia()
+    print("equivalencia OK")
+    print(f"{'grupos':>8} {'cap':>5} {'original s':>12} {'nuevo s':>10} {'acotado s':>10} {'x':>7}")
+    for n, cap in [(200, 40), (1000, 80), (3000, 120), (6000, 120)]:
+        items = _items(n, n)
+        t_orig = _medir(knapsack_original, items, cap)
+        t_nuevo = _medir(knapsack_max_peso_min_items, items, cap)
+        t_acot = _medir(_acotado, items, cap)
+        print(f"{n:>8} {cap:>5} {t_orig:>12.4f} {t_nuevo:>10.4f} {t_acot:>10.4f} {t_orig / t_acot:>7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+# Uso: python -m benchmarks.bench_zip [filas] [vehículos]
+# Libro único (un hilo) vs ZIP con un libro por vehículo escritos en POOL_LIBROS y enviados en streaming.
+import io
+import sys
+import time
+import zipfile
+
+import app
+from benchmarks.generador import a_xlsx, generar_informe, inventario_sintetico, vehiculos_sinteticos
+
+
+def _cliente(xlsx, vehiculos):
+    cliente = app.app.test_client()
+    cliente.post("/", data={"usuario": "admin", "contrasena": "1234"})
+    cliente.post("/upload", data={"file": (io.BytesIO(xlsx), "informe.xlsx")}, content_type="multipart/form-data")
+    with cliente.session_transaction() as s:
+        s["vehiculos"] = [dict(v) for v in vehiculos]
+    return cliente
+
+
+def _descargar(cliente, datos):
+    t0 = time.perf_counter()
+    r = cliente.post("/generar_planeador", data=datos, buffered=False)
+    partes, primero = [], None
+    for parte in r.response:
+        if primero is None and parte: primero = time.perf_counter() - t0
+        partes.append(parte)
+    return primero, time.perf_counter() - t0, b"".join(partes)
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    cantidad = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    xlsx = a_xlsx(generar_informe(filas, ciudades=30, direcciones=3_000, prop_estado_40=1.0))
+    vehiculos = vehiculos_sinteticos(inventario_sintetico(filas, ciudades=30, direcciones=3_000), cantidad)
+    _descargar(_cliente(xlsx, vehiculos), {"salida": "zip"})  # arranque del pool
+    p_xlsx, t_xlsx, _ = _descargar(_cliente(xlsx, vehiculos), {})
+    p_zip, t_zip, datos = _descargar(_cliente(xlsx, vehiculos), {"salida": "zip"})
+    libros = zipfile.ZipFile(io.BytesIO(datos))
+    print(f"filas: {filas}  vehículos: {cantidad}  procesos: {app.POOL_LIBROS.procesos}  libros en el zip: {len(libros.namelist())}")
+    print(f"{'libro único':<14} primer byte {p_xlsx:7.3f} s   total {t_xlsx:7.3f} s")
+    print(f"{'zip por libro':<14} primer byte {p_zip:7.3f} s   total {t_zip:7.3f} s")
+    print(f"zip íntegro: {libros.testzip() is None}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# Informes de reserva sintéticos con la forma de los reales, reproducibles por semilla.
+import io
+
+import numpy as np
+import pandas as pd
+
+from app import COLUMNAS_REPORTE, DICCIONARIO_ACCESORIOS, equivalencias
+
+ESTADOS_OTROS = (10, 20, 30, 50)
+
+
+def generar_informe(filas: int = 10_000, ciudades: int = 20, direcciones: int = 2_000, seed: int = 1,
+                    prop_estado_40: float = 0.85, prop_especiales: float = 0.12, prop_atul_rik: float = 0.01,
+                    prop_ak200zw: float = 0.02, prop_accesorios: float = 0.6, columnas_extra: int = 15) -> pd.DataFrame:
+    """Informe completo (todas las columnas, todos los estados) como lo exporta el ERP.
+
+    Cada `Dirección 1` pertenece a una ciudad y su frecuencia sigue una cola larga,
+    como en los informes reales: pocas direcciones concentran muchas motos.
+    """
+    r = np.random.default_rng(seed)
+    nombres_ciudad = np.array([f"CIUDAD {i:03d}" for i in range(ciudades)], dtype=object)
+    ciudad_dir = r.integers(0, ciudades, direcciones)
+    popularidad = 1.0 / np.arange(1, direcciones + 1) ** 0.8
+    dir_fila = r.choice(direcciones, size=filas, p=popularidad / popularidad.sum())
+    ciudad = nombres_ciudad[ciudad_dir[dir_fila]]
+    minusculas = r.random(filas) < 0.05
+    ciudad[minusculas] = np.char.lower(ciudad[minusculas].astype(str)).astype(object)
+
+    normales = np.array([c for c, e in equivalencias.items() if e == 1] + ["AK125 CHR EIII", "AK150JET"], dtype=object)
+    dobles = np.array([c for c, e in equivalencias.items() if e == 2], dtype=object)
+    tipo = r.random(filas)
+    cod = normales[r.integers(0, len(normales), filas)]
+    es_doble = tipo < prop_especiales
+    cod[es_doble] = dobles[r.integers(0, len(dobles), int(es_doble.sum()))]
+    cod[(tipo >= prop_especiales) & (tipo < prop_especiales + prop_ak200zw)] = "AK200ZW"
+    cod[(tipo >= prop_especiales + prop_ak200zw) & (tipo < prop_especiales + prop_ak200zw + prop_atul_rik)] = "ATUL RIK"
+
+    claves = np.array(sorted({a["clave"] for a in DICCIONARIO_ACCESORIOS}), dtype=object)
+    colores = np.array(["Negro", "Rojo", "Azul", "Gris Mate", "Blanco"], dtype=object)
+    desc = ("Moto " + cod.astype(str) + " " + colores[r.integers(0, len(colores), filas)]).astype(object)
+    con_acc = r.random(filas) < prop_accesorios
+    desc[con_acc] = (claves[r.integers(0, len(claves), int(con_acc.sum()))].astype(str) + " "
+                     + colores[r.integers(0, len(colores), int(con_acc.sum()))].astype(str)).astype(object)
+
+    estado = np.where(r.random(filas) < prop_estado_40, 40, np.array(ESTADOS_OTROS)[r.integers(0, 4, filas)])
+    df = pd.DataFrame({
+        "Nom PV": pd.Series(r.integers(0, 400, filas)).map("PUNTO DE VENTA {}".format).to_numpy(dtype=object),
+        "No Ped": r.integers(1_000_000, 9_999_999, filas),
+        "Descr": np.full(filas, "MOTOCICLETA", dtype=object),
+        "Descr EXXIT": ciudad,
+        "Dirección 1": pd.Series(dir_fila).map("CALLE {} # 10-20".format).to_numpy(dtype=object),
+        "Clnt Envío": pd.Series(dir_fila).map("CLIENTE {}".format).to_numpy(dtype=object),
+        "ID Prod": r.integers(10_000, 99_999, filas),
+        "Descripcion": desc,
+        "ID Serie": pd.Series(np.arange(filas)).map("9FSERIE{:010d}".format).to_numpy(dtype=object),
+        "Estado Satf": estado,
+        "COD INT": cod,
+        "Reserva": pd.Timestamp("2025-01-01") + pd.to_timedelta(r.integers(0, 60 * 24, filas) * 60, unit="min"),
+    })
+    for i in range(columnas_extra):
+        df[f"Columna ERP {i}"] = r.integers(0, 1000, filas)
+    return df
+
+
+def inventario_sintetico(filas: int, seed: int = 1, **kwargs) -> pd.DataFrame:
+    """Inventario ya ingerido (Estado 40, columnas del planeador y peso_espacio)."""
+    df = generar_informe(filas, seed=seed, prop_estado_40=1.0, **kwargs)
+    df = df[COLUMNAS_REPORTE].copy()
+    df["peso_espacio"] = df["COD INT"].map(equivalencias).fillna(1).astype("int8")
+    return df
+
+
+def a_xlsx(df: pd.DataFrame) -> bytes:
+    salida = io.BytesIO()
+    # Sin constant_memory: pandas escribe por columnas y en ese modo solo quedaría la primera
+    with pd.ExcelWriter(salida, engine="xlsxwriter") as w:
+        df.to_excel(w, index=False)
+    return salida.getvalue()
+
+
+def vehiculos_sinteticos(inventario: pd.DataFrame, cantidad: int = 30, seed: int = 1) -> list:
+    """Cola de vehículos como la que arma un despachador: 1 a 3 ciudades, 40 a 120 espacios."""
+    r = np.random.default_rng(seed)
+    ciudades = sorted(inventario["Descr EXXIT"].str.upper().dropna().unique())
+    especiales = inventario.loc[inventario["peso_espacio"] > 1, ["Descr EXXIT", "COD INT"]].drop_duplicates()
+    refs = sorted({f"{c.upper()}_{cod}" for c, cod in zip(especiales["Descr EXXIT"], especiales["COD INT"])})
+    modos = ["todas"] * 6 + ["normales"] * 2 + ["especiales"]
+    cola = []
+    for i in range(cantidad):
+        elegidas = [str(c) for c in r.choice(ciudades, size=min(len(ciudades), int(r.integers(1, 4))), replace=False)]
+        permitidas = [ref for ref in refs if ref.rsplit("_", 1)[0] in elegidas and r.random() < 0.8]
+        cola.append({"placa": f"BEN{i:03d}", "cantidad_motos": int(r.choice([40, 60, 80, 100, 120])),
+                     "transportadora": "TRANSPORTES BENCH", "conductor": f"CONDUCTOR {i}",
+                     "ciudades": elegidas, "modo_carga": str(r.choice(modos)), "refs_permitidas": permitidas})
+    return cola
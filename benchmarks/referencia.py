@@ -0,0 +1,71 @@
+# Implementaciones originales, conservadas solo para comparar resultados y tiempos.
+from typing import List, Tuple
+
+
+def knapsack_original(items: List[dict], capacidad: int) -> Tuple[List[int], int]:
+    dp = [(0, 0)] * (capacidad + 1)
+    sel = [[] for _ in range(capacidad + 1)]
+    for item in items:
+        w = item["peso"]
+        for c in range(capacidad, w - 1, -1):
+            cand = (dp[c - w][0] + w, dp[c - w][1] - 1)
+            if cand > dp[c]:
+                dp[c] = cand
+                sel[c] = sel[c - w] + [item["id"]]
+    best_c = max(range(capacidad + 1), key=lambda x: dp[x])
+    return sel[best_c], dp[best_c][0]
+
+
+def conteo_accesorios_original(asignado, catalogo):
+    import pandas as pd
+    conteo_acc = {}
+    for _, moto in asignado.iterrows():
+        desc_moto = str(moto["Descripcion"]).upper()
+        for item in catalogo:
+            if item["clave"].upper() in desc_moto:
+                ref_a = item["ref"]
+                if ref_a not in conteo_acc:
+                    conteo_acc[ref_a] = {"desc": item["desc"], "cant": 0}
+                conteo_acc[ref_a]["cant"] += 1
+    return pd.DataFrame([
+        {"Número de artículo": k, "Descripción": v_acc["desc"], "Cantidad a despachar": v_acc["cant"]}
+        for k, v_acc in conteo_acc.items()
+    ])
+
+
+def peso_espacio_original(cod_int_serie, get_equivalencia):
+    return cod_int_serie.apply(get_equivalencia)
+
+
+def permitidos_original(posibles, modo, permitidas):
+    def permitido(r):
+        if modo == "normales" and r["peso_espacio"] > 1: return False
+        if modo == "especiales" and r["peso_espacio"] == 1: return False
+        if r["peso_espacio"] > 1:
+            return f"{r['Descr EXXIT'].upper()}_{r['COD INT']}" in permitidas
+        return True
+    return posibles.apply(permitido, axis=1)
+
+
+def planear_original(df, vehiculos, presupuesto_seg, max_celdas, removidas=None):
+    # Filtro, copia, orden y drop del inventario pendiente en cada vehículo
+    import numpy as np
+    from optimizador import resolver_vehiculo
+    from planes import mascara_permitidos
+    df_pend = df[~removidas] if removidas is not None and removidas.any() else df
+    plan = []
+    for v in vehiculos:
+        cap = v["cantidad_motos"]
+        posibles = df_pend[df_pend["Descr EXXIT"].str.upper().isin(v["ciudades"])].copy()
+        posibles = posibles.sort_values(["Reserva", "Dirección 1"])
+        posibles = posibles[mascara_permitidos(posibles, v["modo_carga"], v["refs_permitidas"])]
+        posibles["peso_espacio"] = posibles["peso_espacio"].astype("int64")
+        grupos = posibles.groupby("Dirección 1", observed=True).agg(peso=("peso_espacio", "sum"), idxs=("peso_espacio", lambda x: list(x.index))).reset_index()
+        items = [{"id": i, "peso": int(r["peso"])} for i, r in grupos.iterrows() if r["peso"] <= cap]
+        sol = resolver_vehiculo(items, cap, presupuesto_seg, max_celdas)
+        filas = []
+        if sol.peso > 0:
+            for gid in sol.ids: filas.extend(grupos.iloc[gid]["idxs"])
+            df_pend = df_pend.drop(filas)
+        plan.append((np.asarray(filas, dtype=df.index.dtype), sol))
+    return plan
@@ -0,0 +1,184 @@
+# Escenarios de rendimiento reproducibles. Ver benchmarks/__main__.py para la línea de comandos.
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+PARAMETROS_DEFECTO = {"filas": 20_000, "ciudades": 30, "direcciones": 3_000, "vehiculos": 20, "seed": 1}
+
+
+class Contexto:
+    """Datos sintéticos compartidos por los escenarios (se generan una sola vez)."""
+
+    def __init__(self, parametros: dict):
+        from benchmarks import generador
+        self.p = parametros
+        self.informe = generador.generar_informe(parametros["filas"], parametros["ciudades"],
+                                                 parametros["direcciones"], seed=parametros["seed"])
+        self.xlsx = generador.a_xlsx(self.informe)
+        self.inventario = generador.inventario_sintetico(parametros["filas"], parametros["seed"],
+                                                         ciudades=parametros["ciudades"],
+                                                         direcciones=parametros["direcciones"])
+        self.vehiculos = generador.vehiculos_sinteticos(self.inventario, parametros["vehiculos"], parametros["seed"])
+
+
+def verificar_informe(ctx: Contexto) -> None:
+    """El xlsx sintético debe ingerirse completo; si no, los escenarios de upload miden un informe vacío."""
+    import app
+    from ingesta import leer_informe
+    with tempfile.TemporaryDirectory() as tmp:
+        df = leer_informe(ctx.xlsx, app.COLUMNAS_REPORTE, tmp)
+    esperadas = int((ctx.informe["Estado Satf"] == 40).sum())
+    if len(df) != esperadas or df["COD INT"].isna().all():
+        raise AssertionError(f"el informe sintético se ingirió incompleto: {len(df)} de {esperadas} filas")
+
+
+def _cliente_con_inventario(ctx: Contexto):
+    import io
+    import app
+    cliente = app.app.test_client()
+    cliente.post("/", data={"usuario": "admin", "contrasena": "1234"})
+
+    def subir():
+        cliente.post("/upload", data={"file": (io.BytesIO(ctx.xlsx), "informe.xlsx")},
+                     content_type="multipart/form-data")
+    return cliente, subir
+
+
+def esc_upload_frio(ctx):
+    import app
+    cliente, subir = _cliente_con_inventario(ctx)
+    return lambda: shutil.rmtree(app.CACHE_INFORMES, ignore_errors=True), subir
+
+
+def esc_upload_cache(ctx):
+    cliente, subir = _cliente_con_inventario(ctx)
+    subir()
+    return None, subir
+
+
+def esc_resumen_inventario(ctx):
+    import app
+
+    def ejecutar():
+        with app.app.test_request_context():
+            app._actualizar_estado_inventario(ctx.inventario, "bench")
+    return None, ejecutar
+
+
+def _items(ctx, capacidad):
+    pesos = ctx.inventario.groupby("Dirección 1")["peso_espacio"].sum().astype(int).tolist()
+    return [{"id": i, "peso": w} for i, w in enumerate(pesos) if w <= capacidad]
+
+
+def esc_knapsack_exacto(ctx):
+    from optimizador import knapsack_max_peso_min_items
+    items = _items(ctx, 120)
+    return None, lambda: knapsack_max_peso_min_items(items, 120)
+
+
+def esc_resolver_vehiculo(ctx):
+    import app
+    from optimizador import resolver_vehiculo
+    items = _items(ctx, 120)
+    return None, lambda: resolver_vehiculo(items, 120, app.PRESUPUESTO_VEHICULO_SEG, app.MAX_CELDAS_DP)
+
+
+def esc_accesorios(ctx):
+    import app
+    from accesorios import IndiceAccesorios
+    descripciones = ctx.inventario["Descripcion"]
+    # índice nuevo en cada repetición: incluye el costo de buscar cada descripción distinta
+    return None, lambda: IndiceAccesorios(app.DICCIONARIO_ACCESORIOS).conteo(descripciones)
+
+
+def esc_generar_planeador(ctx):
+    cliente, subir = _cliente_con_inventario(ctx)
+
+    def antes():
+        subir()
+        with cliente.session_transaction() as s:
+            s["vehiculos"] = [dict(v) for v in ctx.vehiculos]
+
+    def ejecutar():
+        r = cliente.post("/generar_planeador")
+        assert r.status_code == 200, r.status_code
+        r.get_data()
+    return antes, ejecutar
+
+
+def esc_previa_plan(ctx):
+    cliente, subir = _cliente_con_inventario(ctx)
+
+    def antes():
+        subir()  # versión nueva del inventario: la previa no sale de la caché
+        with cliente.session_transaction() as s:
+            s["vehiculos"] = [dict(v) for v in ctx.vehiculos]
+
+    def ejecutar():
+        r = cliente.get("/planes/previa")
+        assert r.status_code == 200, r.status_code
+    return antes, ejecutar
+
+
+ESCENARIOS: Dict[str, Callable[[Contexto], Tuple[Optional[Callable], Callable]]] = {
+    "upload_frio": esc_upload_frio,
+    "upload_cache": esc_upload_cache,
+    "resumen_inventario": esc_resumen_inventario,
+    "knapsack_exacto": esc_knapsack_exacto,
+    "resolver_vehiculo": esc_resolver_vehiculo,
+    "accesorios": esc_accesorios,
+    "generar_planeador": esc_generar_planeador,
+    "previa_plan": esc_previa_plan,
+}
+
+
+def _commit() -> Optional[str]:
+    try:
+        raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=raiz, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def ejecutar_suite(parametros: dict, repeticiones: int = 5, nombres=None, log=print) -> dict:
+    ctx = Contexto(parametros)
+    verificar_informe(ctx)
+    resultados = {}
+    for nombre in nombres or ESCENARIOS:
+        antes, ejecutar = ESCENARIOS[nombre](ctx)
+        ejecutar() if antes is None else (antes(), ejecutar())  # calentamiento
+        muestras = []
+        for _ in range(repeticiones):
+            if antes is not None: antes()
+            t0 = time.perf_counter()
+            ejecutar()
+            muestras.append(time.perf_counter() - t0)
+        resultados[nombre] = {"repeticiones": repeticiones, "min_s": min(muestras),
+                              "mediana_s": statistics.median(muestras), "muestras": muestras}
+        log(f"{nombre:<22} mediana {resultados[nombre]['mediana_s']:.4f} s   min {resultados[nombre]['min_s']:.4f} s")
+    return {"version": 1, "commit": _commit(), "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "parametros": parametros, "escenarios": resultados}
+
+
+def comparar(base: dict, actual: dict, umbral: float) -> list:
+    """Escenarios cuya mediana empeoró más de `umbral` (0.2 = 20 %) frente a `base`."""
+    regresiones = []
+    for nombre, r in actual["escenarios"].items():
+        b = base.get("escenarios", {}).get(nombre)
+        if b is None or b["mediana_s"] <= 0: continue
+        razon = r["mediana_s"] / b["mediana_s"]
+        if razon > 1 + umbral: regresiones.append((nombre, b["mediana_s"], r["mediana_s"], razon))
+    return regresiones
+
+
+def guardar(resultado: dict, ruta: str) -> None:
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
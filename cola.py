@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import io
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from ingesta import ColumnasFaltantes
+from perezoso import Perezoso
+
+pd = Perezoso("pandas", globals())
+
+MODOS_CARGA = ("todas", "normales", "especiales")
+CAMPOS_OBLIGATORIOS = ["placa", "cantidad_motos", "ciudades"]
+# Encabezados que se aceptan en CSV/xlsx además de los nombres del formulario
+ALIAS = {"capacidad": "cantidad_motos", "ciudad": "ciudades", "modo": "modo_carga",
+         "referencias": "refs_especiales", "refs_permitidas": "refs_especiales"}
+_SEPARADOR = re.compile(r"[;,]")
+
+
+class IndiceReferencias:
+    """Referencias especiales de la sesión indexadas por id `CIUDAD_COD` y por COD INT.
+
+    `resumen` devuelve las entradas en el mismo orden que recorrer `referencias_seleccionadas`.
+    """
+
+    def __init__(self, referencias: Dict[str, List[dict]]):
+        self.por_id: Dict[str, Tuple[int, str, dict]] = {}
+        self.por_cod: Dict[str, List[str]] = {}
+        self.mayusculas: Dict[str, str] = {}
+        for ciudad, lista in referencias.items():
+            for r in lista:
+                ref_id = f"{ciudad}_{r['cod_int']}"
+                self.por_id[ref_id] = (len(self.por_id), ciudad, {
+                    "ciudad": ciudad, "nombre": r["cod_int"],
+                    "cant": r["cantidad"], "peso_total": r["cantidad"] * r["equivalencia"]})
+                self.por_cod.setdefault(str(r["cod_int"]).upper(), []).append(ref_id)
+                self.mayusculas[ref_id.upper()] = ref_id
+
+    def resumen(self, ciudades: Iterable[str], refs_ids: Iterable[str]) -> List[dict]:
+        ciudades = set(ciudades)
+        elegidas = sorted(self.por_id[i] for i in set(refs_ids) if i in self.por_id and self.por_id[i][1] in ciudades)
+        return [dict(e) for _, _, e in elegidas]
+
+    def de_ciudades(self, ciudades: Iterable[str]) -> List[str]:
+        ciudades = set(ciudades)
+        return [i for i, (_, c, _) in self.por_id.items() if c in ciudades]
+
+
+def _lista(valor) -> List[str]:
+    if valor is None: return []
+    partes = valor if isinstance(valor, (list, tuple)) else _SEPARADOR.split(str(valor))
+    return [str(p).strip() for p in partes if str(p).strip()]
+
+
+def _entero(valor):
+    try:
+        n = float(str(valor).strip().replace(",", "."))
+    except ValueError:
+        return None
+    return int(n) if n.is_integer() else None
+
+
+def leer_vehiculos(contenido: bytes, nombre: str) -> List[dict]:
+    """Filas de un CSV (`,` o `;`) o de la primera hoja de un xlsx, con encabezados normalizados."""
+    if nombre.lower().endswith((".csv", ".txt")):
+        df = pd.read_csv(io.BytesIO(contenido), sep=None, engine="python", dtype=str,
+                         keep_default_na=False, encoding="utf-8-sig")
+    else:
+        df = pd.read_excel(io.BytesIO(contenido), dtype=str, keep_default_na=False)
+    columnas = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    df.columns = [ALIAS.get(c, c) for c in columnas]
+    faltan = [c for c in CAMPOS_OBLIGATORIOS if c not in df]
+    if faltan: raise ColumnasFaltantes(faltan)
+    return df.to_dict("records")
+
+
+def validar_vehiculos(filas: List[dict], indice: IndiceReferencias,
+                      ciudades_conocidas: Iterable[str] = ()) -> Tuple[List[dict], List[dict]]:
+    """Vehículos listos para la cola y errores por fila (`fila` empieza en 1).
+
+    Las referencias se dan como `CIUDAD_COD` o solo COD INT (todas las ciudades del vehículo que la
+    tengan); vacías = todas las de sus ciudades, como el formulario; `ninguna` = sin especiales.
+    Con `ciudades_conocidas` no vacío, una ciudad sin inventario es un error.
+    """
+    conocidas = set(ciudades_conocidas)
+    vehiculos, errores = [], []
+    for n, fila in enumerate(filas, 1):
+        if not isinstance(fila, dict):
+            errores.append({"fila": n, "placa": None, "errores": ["la fila no es un objeto"]})
+            continue
+        problemas = []
+        placa = str(fila.get("placa") or "").strip().upper()
+        if not placa: problemas.append("falta la placa")
+        cantidad = _entero(fila.get("cantidad_motos", ""))
+        if cantidad is None or cantidad <= 0: problemas.append(f"capacidad inválida: {fila.get('cantidad_motos')!r}")
+        ciudades = [c.upper() for c in _lista(fila.get("ciudades"))]
+        if not ciudades: problemas.append("sin ciudades")
+        elif conocidas:
+            desconocidas = [c for c in ciudades if c not in conocidas]
+            if desconocidas: problemas.append(f"ciudades sin inventario: {', '.join(desconocidas)}")
+        modo = str(fila.get("modo_carga") or "todas").strip().lower()
+        if modo not in MODOS_CARGA: problemas.append(f"modo de carga inválido: {modo!r}")
+        pedidas = _lista(fila.get("refs_especiales"))
+        if not pedidas:
+            refs_ids = indice.de_ciudades(ciudades)
+        elif [p.lower() for p in pedidas] == ["ninguna"]:
+            refs_ids = []
+        else:
+            refs_ids = []
+            for ref in pedidas:
+                ref_id = indice.mayusculas.get(ref.upper())
+                if ref_id is not None:
+                    if indice.por_id[ref_id][1] in ciudades: refs_ids.append(ref_id)
+                    else: problemas.append(f"referencia de otra ciudad: {ref}")
+                    continue
+                propias = [i for i in indice.por_cod.get(ref.upper(), []) if indice.por_id[i][1] in ciudades]
+                if propias: refs_ids.extend(propias)
+                else: problemas.append(f"referencia desconocida: {ref}")
+        if problemas:
+            errores.append({"fila": n, "placa": placa or None, "errores": problemas})
+            continue
+        vehiculos.append({
+            "transportadora": str(fila.get("transportadora") or "").strip(),
+            "conductor": str(fila.get("conductor") or "").strip(),
+            "placa": placa,
+            "cantidad_motos": cantidad,
+            "ciudades": ciudades,
+            "modo_carga": modo,
+            "refs_permitidas": list(dict.fromkeys(refs_ids)),
+            "resumen_visual": indice.resumen(ciudades, refs_ids),
+            "procesado": False
+        })
+    return vehiculos, errores
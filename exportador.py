@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import datetime
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional
+
+from metricas import etapa
+from perezoso import Perezoso
+from procesos import pool_procesos
+
+pd = Perezoso("pandas", globals())
+xlsxwriter = Perezoso("xlsxwriter", globals())
+
+COL_ACCESORIOS = 13  # columna N
+FILA_TABLA = 3       # la tabla de motos (y la de accesorios) empieza en la fila 4
+
+
+def _columna(serie: pd.Series) -> list:
+    # Valores Python listos para xlsxwriter; None = celda vacía (igual que na_rep="" de pandas)
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+class LibroPlaneador:
+    """Escritor del planeador con xlsxwriter en modo constant_memory.
+
+    Cada hoja se escribe fila por fila, en orden, sin pasar por DataFrame.to_excel.
+    Mantiene el formato de pandas (encabezados en negrita con borde, fechas
+    AAAA-MM-DD HH:MM:SS) y el bloque azul de accesorios en la columna N.
+    """
+
+    def __init__(self, destino):
+        self.libro = xlsxwriter.Workbook(destino, {"constant_memory": True})
+        self._f_encabezado = self.libro.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        self._f_fecha = self.libro.add_format({"num_format": "YYYY-MM-DD HH:MM:SS"})
+        self._f_dia = self.libro.add_format({"num_format": "YYYY-MM-DD"})
+        self._f_accesorios = self.libro.add_format({"bold": True, "font_color": "blue"})
+        self._nombres = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        with etapa("escritura_xlsx"):
+            self.libro.close()
+
+    def _hoja(self, nombre: str):
+        # xlsxwriter no permite repetir hojas (pandas escribía encima): se numeran las repetidas
+        base, n = nombre, 2
+        while nombre.upper() in self._nombres:
+            sufijo = f" ({n})"
+            nombre, n = base[:31 - len(sufijo)] + sufijo, n + 1
+        self._nombres.add(nombre.upper())
+        return self.libro.add_worksheet(nombre)
+
+    def _fila_tabla(self, ws, fila, col0, valores):
+        # Fechas con formato de fecha sea cual sea el dtype de la columna (también object o category)
+        for j, val in enumerate(valores):
+            if val is None: continue
+            if isinstance(val, datetime.datetime):
+                ws.write_datetime(fila, col0 + j, val, self._f_fecha)
+            elif isinstance(val, datetime.date):
+                ws.write_datetime(fila, col0 + j, val, self._f_dia)
+            else:
+                ws.write(fila, col0 + j, val)
+
+    def _tabla(self, df: pd.DataFrame):
+        cols = [_columna(df[c]) for c in df.columns]
+        return list(df.columns), (zip(*cols) if cols else iter(()))
+
+    def hoja_vehiculo(self, nombre: str, encabezado: dict, motos: pd.DataFrame,
+                      accesorios: Optional[pd.DataFrame] = None) -> None:
+        ws = self._hoja(nombre)
+        ws.write_row(0, 0, list(encabezado), self._f_encabezado)
+        ws.write_row(1, 0, list(encabezado.values()))
+        hay_acc = accesorios is not None and not accesorios.empty
+        if hay_acc: ws.write(FILA_TABLA - 1, COL_ACCESORIOS, "Campo de accesorios", self._f_accesorios)
+        cols, filas = self._tabla(motos)
+        ws.write_row(FILA_TABLA, 0, cols, self._f_encabezado)
+        filas_acc: Iterator = iter(())
+        if hay_acc:
+            cols_acc, filas_acc = self._tabla(accesorios)
+            ws.write_row(FILA_TABLA, COL_ACCESORIOS, cols_acc, self._f_encabezado)
+        # constant_memory exige escribir en orden de fila: motos y accesorios avanzan juntos
+        fila = FILA_TABLA + 1
+        for moto in filas:
+            self._fila_tabla(ws, fila, 0, moto)
+            acc = next(filas_acc, None)
+            if acc is not None: self._fila_tabla(ws, fila, COL_ACCESORIOS, acc)
+            fila += 1
+        for acc in filas_acc:
+            self._fila_tabla(ws, fila, COL_ACCESORIOS, acc)
+            fila += 1
+
+    def hoja_tabla(self, nombre: str, df: pd.DataFrame) -> None:
+        ws = self._hoja(nombre)
+        cols, filas = self._tabla(df)
+        ws.write_row(0, 0, cols, self._f_encabezado)
+        for i, fila in enumerate(filas, start=1):
+            self._fila_tabla(ws, i, 0, fila)
+
+
+def escribir_libro(destino: str, hojas: list) -> str:
+    """Libro con `hojas` = [("vehiculo", nombre, encabezado, motos, accesorios) | ("tabla", nombre, df)].
+
+    Corre en los procesos de PoolLibros; devuelve `destino`.
+    """
+    with LibroPlaneador(destino) as libro:
+        for tipo, *args in hojas: getattr(libro, f"hoja_{tipo}")(*args)
+    return destino
+
+
+def _compacto(df: pd.DataFrame) -> pd.DataFrame:
+    # Las columnas del inventario mmap traen todas las categorías del inventario: no viajan al proceso
+    cats = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    return df.assign(**{c: df[c].cat.remove_unused_categories() for c in cats}) if cats else df
+
+
+class PoolLibros:
+    """Procesos que escriben libros en paralelo (xlsxwriter es Python puro: los hilos no rinden)."""
+
+    def __init__(self, procesos: int):
+        self.procesos = procesos
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def ejecutor(self) -> Executor:
+        with self._lock:
+            if self._pool is not None and getattr(self._pool, "_broken", False): self._pool = None
+            if self._pool is None:
+                if self.procesos <= 1:
+                    self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="libro")
+                else:
+                    self._pool = pool_procesos(self.procesos, ["pandas", "xlsxwriter", __name__])
+            return self._pool
+
+
+class _Tubo:
+    # Destino no posicionable para zipfile: acumula lo escrito hasta que el generador lo entrega
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self.pendiente = 0
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        self.pendiente += len(datos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        datos, self._partes, self.pendiente = b"".join(self._partes), [], 0
+        return datos
+
+
+class LibrosZip:
+    """Misma interfaz que LibroPlaneador, pero cada hoja va en su propio libro.
+
+    Los libros se escriben en `ejecutor` apenas se piden; `bloques_zip()` los empaqueta en un ZIP
+    a medida que terminan, así los primeros bytes salen antes de escribir el último libro.
+    """
+
+    def __init__(self, ejecutor: Executor):
+        self._ejecutor = ejecutor
+        self._pendientes = []  # (nombre en el zip, futuro)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is not None: self.cancelar()
+
+    def _enviar(self, nombre: str, hojas: list) -> None:
+        ruta = archivo_temporal()
+        self._pendientes.append((f"{len(self._pendientes) + 1:02d}_{nombre}.xlsx", ruta,
+                                 self._ejecutor.submit(escribir_libro, ruta, hojas)))
+
+    def hoja_vehiculo(self, nombre: str, encabezado: dict, motos: pd.DataFrame,
+                      accesorios: Optional[pd.DataFrame] = None) -> None:
+        self._enviar(nombre, [("vehiculo", nombre, encabezado, _compacto(motos), accesorios)])
+
+    def hoja_tabla(self, nombre: str, df: pd.DataFrame) -> None:
+        self._enviar(nombre, [("tabla", nombre, _compacto(df))])
+
+    def bloques_zip(self, tam_bloque: int = 64 * 1024) -> Iterator[bytes]:
+        """Generador para respuestas en streaming: el ZIP se escribe sin posicionarse (sirve para un socket)."""
+        tubo, nombres = _Tubo(), {futuro: archivo for archivo, _, futuro in self._pendientes}
+        try:
+            # Los xlsx ya vienen comprimidos: se guardan tal cual
+            with zipfile.ZipFile(tubo, "w", zipfile.ZIP_STORED) as z:
+                for futuro in as_completed(nombres):
+                    ruta = futuro.result()
+                    with open(ruta, "rb") as origen, z.open(nombres[futuro], "w") as entrada:
+                        while True:
+                            bloque = origen.read(tam_bloque)
+                            if not bloque: break
+                            entrada.write(bloque)
+                            if tubo.pendiente >= tam_bloque: yield tubo.vaciar()
+                    os.remove(ruta)
+                    yield tubo.vaciar()
+            yield tubo.vaciar()
+        finally:
+            self.cancelar()
+
+    def cancelar(self) -> None:
+        # Borra los libros que no se llegaron a enviar (error o cliente desconectado)
+        for _, ruta, futuro in self._pendientes:
+            futuro.cancel()
+            futuro.add_done_callback(lambda _, ruta=ruta: _borrar_si_existe(ruta))
+
+
+def _borrar_si_existe(ruta: str) -> None:
+    if os.path.exists(ruta): os.remove(ruta)
+
+
+def archivo_temporal(sufijo: str = ".xlsx") -> str:
+    fd, ruta = tempfile.mkstemp(suffix=sufijo)
+    os.close(fd)
+    return ruta
+
+
+def leer_por_bloques(ruta: str, tam_bloque: int = 64 * 1024, borrar: bool = True) -> Iterator[bytes]:
+    """Generador para respuestas en streaming; borra el archivo al terminar."""
+    try:
+        with open(ruta, "rb") as f:
+            while True:
+                bloque = f.read(tam_bloque)
+                if not bloque: break
+                yield bloque
+    finally:
+        if borrar and os.path.exists(ruta): os.remove(ruta)
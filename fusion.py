@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from typing import List, NamedTuple
+
+from perezoso import Perezoso
+
+np = Perezoso("numpy", globals())
+pd = Perezoso("pandas", globals())
+
+# Fusión de un informe nuevo con el inventario vivo, usando `ID Serie` como llave.
+#
+# La diferencia se calcula contra la "base": llave, huella y peso de cada fila del último informe
+# cargado, más la etiqueta que esa fila tiene en el inventario. No se compara contra el inventario
+# vivo porque este ya no tiene las unidades despachadas, y esas no deben volver a entrar aunque el
+# informe nuevo las siga trayendo en estado 40.
+
+
+class Fusion(NamedTuple):
+    inventario: pd.DataFrame  # inventario vivo ya fusionado
+    base: pd.DataFrame        # base para la próxima fusión
+    removidas: pd.DataFrame   # filas que salen del inventario vivo (con sus valores anteriores)
+    agregadas: pd.DataFrame   # filas que entran al inventario vivo (nuevas o actualizadas)
+    nuevas: int
+    salientes: int
+    actualizadas: int
+    delta_fisico: int         # cambio del total del informe, en unidades
+    delta_equivalente: int    # y en espacios
+
+    def a_dict(self) -> dict:
+        return {"nuevas": self.nuevas, "salientes": self.salientes, "actualizadas": self.actualizadas,
+                "delta_fisico": self.delta_fisico, "delta_equivalente": self.delta_equivalente}
+
+
+def _huellas(informe: pd.DataFrame, columnas: List[str]) -> np.ndarray:
+    return pd.util.hash_pandas_object(informe[columnas], index=False).to_numpy()
+
+
+def _claves(informe: pd.DataFrame, huellas: np.ndarray) -> np.ndarray:
+    # ID Serie (o la huella si viene vacío) + número de aparición, para que las repetidas no choquen
+    serie = informe["ID Serie"].astype(object)
+    llave = serie.where(serie.notna(), pd.Series(huellas, index=informe.index).map("#{:x}".format)).astype(str)
+    llave = llave + "|" + llave.groupby(llave, sort=False).cumcount().astype(str)
+    return pd.util.hash_array(llave.to_numpy(dtype=object))
+
+
+def base_de_informe(informe: pd.DataFrame, columnas: List[str]) -> pd.DataFrame:
+    """Base de un informe cargado completo (sus etiquetas son las del inventario recién creado)."""
+    huellas = _huellas(informe, columnas)
+    return pd.DataFrame({"clave": _claves(informe, huellas), "huella": huellas,
+                         "peso": informe["peso_espacio"].to_numpy(dtype=np.int8),
+                         "etiqueta": informe.index.to_numpy(dtype=np.int64)})
+
+
+def fusionar(vivo: pd.DataFrame, base: pd.DataFrame, informe: pd.DataFrame, columnas: List[str]) -> Fusion:
+    """`informe`: filas en estado 40 con `peso_espacio`; `columnas`: las del informe que forman la huella.
+
+    `vivo` puede venir de la caché de inventarios: no se modifica.
+    """
+    huellas = _huellas(informe, columnas)
+    claves = _claves(informe, huellas)
+    pos_base = pd.Index(base["clave"].to_numpy()).get_indexer(claves)
+    esta = pos_base >= 0
+    sigue = np.zeros(len(base), dtype=bool)
+    sigue[pos_base[esta]] = True
+    cambio = np.zeros(len(informe), dtype=bool)
+    cambio[esta] = base["huella"].to_numpy()[pos_base[esta]] != huellas[esta]
+
+    etiquetas_base = base["etiqueta"].to_numpy()
+    etiquetas = np.empty(len(informe), dtype=np.int64)
+    etiquetas[esta] = etiquetas_base[pos_base[esta]]
+    siguiente = max(int(etiquetas_base.max(initial=-1)), int(vivo.index.max()) if len(vivo) else -1) + 1
+    etiquetas[~esta] = np.arange(siguiente, siguiente + int((~esta).sum()))
+
+    # Solo se tocan filas que siguen en el inventario vivo: las ya despachadas no vuelven a entrar
+    salen = vivo.index.isin(etiquetas_base[~sigue])
+    actualizar = vivo.index.isin(etiquetas[cambio])
+    removidas = vivo[salen | actualizar]
+    entran = ~esta | (cambio & np.isin(etiquetas, vivo.index[actualizar]))
+    agregadas = informe.loc[entran, columnas + ["peso_espacio"]].set_axis(etiquetas[entran], axis=0)
+    inventario = vivo[~(salen | actualizar)]
+    if len(agregadas): inventario = pd.concat([inventario, agregadas]).sort_index(kind="stable")
+
+    peso = informe["peso_espacio"].to_numpy(dtype=np.int8)
+    return Fusion(
+        inventario=inventario,
+        base=pd.DataFrame({"clave": claves, "huella": huellas, "peso": peso, "etiqueta": etiquetas}),
+        removidas=removidas, agregadas=agregadas,
+        nuevas=int((~esta).sum()), salientes=int((~sigue).sum()), actualizadas=int(cambio.sum()),
+        delta_fisico=len(informe) - len(base),
+        delta_equivalente=int(peso.sum(dtype=np.int64)) - int(base["peso"].sum()),
+    )
@@ -0,0 +1,14 @@
+# gunicorn lo lee solo desde el directorio de trabajo (Procfile y Dockerfile no necesitan -c).
+#
+# Con preload_app la app se importa una vez en el maestro y when_ready la precalienta (pandas, numpy,
+# xlsxwriter, openpyxl, catálogos) antes de crear los workers: estos arrancan en frío sin importar nada
+# y comparten esas páginas de memoria. GUNICORN_PRELOAD=0 vuelve a importar la app en cada worker.
+import os
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        import app
+        app.precargar()
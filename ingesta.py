@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import pickle
+import uuid
+import zipfile
+from typing import List
+
+from perezoso import Perezoso
+
+np = Perezoso("numpy", globals())
+pd = Perezoso("pandas", globals())
+
+ESTADO_DISPONIBLE = 40
+_VERSION_CACHE = 1
+# Mismos valores que pandas interpreta como vacíos al leer Excel
+_NA_TEXTO = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+             "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+COLUMNAS_TEXTO = ("Nom PV", "Descr", "Descr EXXIT", "Dirección 1", "Clnt Envío", "Descripcion", "ID Serie", "COD INT")
+
+
+class ColumnasFaltantes(ValueError):
+    pass
+
+
+def _valor(v):
+    # Misma conversión de celdas que pandas con openpyxl
+    if isinstance(v, float) and v.is_integer(): return int(v)
+    if isinstance(v, str) and v in _NA_TEXTO: return None
+    return v
+
+
+def _estado(v):
+    # Estado Satf como número aunque la celda sea texto ("40"), como cuando pandas infiere la columna
+    if isinstance(v, str):
+        try:
+            return float(v.strip())
+        except ValueError:
+            return None
+    return v
+
+
+def _tipar(df: pd.DataFrame) -> pd.DataFrame:
+    for col in COLUMNAS_TEXTO:
+        if col in df: df[col] = df[col].astype(object).where(df[col].notna(), np.nan)
+    df["Estado Satf"] = pd.to_numeric(df["Estado Satf"]).astype("int64")
+    df["Reserva"] = pd.to_datetime(df["Reserva"], errors="coerce")
+    return df.reset_index(drop=True)
+
+
+def _leer_xlsx(contenido: bytes, columnas: List[str]) -> pd.DataFrame:
+    import openpyxl
+    wb = openpyxl.load_workbook(io.BytesIO(contenido), read_only=True, data_only=True)
+    try:
+        filas = wb.worksheets[0].iter_rows(values_only=True)
+        encabezado = list(next(filas, ()))
+        faltan = [c for c in columnas if c not in encabezado]
+        if faltan: raise ColumnasFaltantes(faltan)
+        pos = [encabezado.index(c) for c in columnas]
+        pos_estado = encabezado.index("Estado Satf")
+        datos = []
+        for fila in filas:
+            if pos_estado >= len(fila) or _estado(fila[pos_estado]) != ESTADO_DISPONIBLE: continue
+            datos.append([_valor(fila[p]) if p < len(fila) else None for p in pos])
+    finally:
+        wb.close()
+    return pd.DataFrame(datos, columns=columnas)
+
+
+def _leer_generico(contenido: bytes, columnas: List[str]) -> pd.DataFrame:
+    # Formatos que openpyxl no abre (p. ej. .xls): pandas, pero proyectando columnas
+    df = pd.read_excel(io.BytesIO(contenido), usecols=lambda c: c in columnas)
+    faltan = [c for c in columnas if c not in df]
+    if faltan: raise ColumnasFaltantes(faltan)
+    return df.loc[pd.to_numeric(df["Estado Satf"], errors="coerce") == ESTADO_DISPONIBLE, columnas]
+
+
+def leer_informe(contenido: bytes, columnas: List[str], carpeta_cache: str) -> pd.DataFrame:
+    """Filas en Estado Satf 40 del informe de reserva, solo con `columnas`.
+
+    El resultado se guarda por hash del contenido: volver a subir el mismo informe no lo vuelve a leer.
+    """
+    if "Estado Satf" not in columnas: columnas = list(columnas) + ["Estado Satf"]
+    clave = hashlib.sha256(contenido)
+    clave.update(repr((_VERSION_CACHE, list(columnas))).encode())
+    ruta = os.path.join(carpeta_cache, f"{clave.hexdigest()}.pkl")
+    if os.path.exists(ruta):
+        try:
+            df = pd.read_pickle(ruta)
+            os.utime(ruta)  # último uso, para la limpieza por TTL
+            return df
+        except Exception:
+            pass
+    from openpyxl.utils.exceptions import InvalidFileException
+    try:
+        df = _leer_xlsx(contenido, columnas)
+    except (zipfile.BadZipFile, InvalidFileException):  # no es xlsx (p. ej. .xls): lo abre pandas
+        df = _leer_generico(contenido, columnas)
+    df = _tipar(df)
+    os.makedirs(carpeta_cache, exist_ok=True)
+    tmp = f"{ruta}.{uuid.uuid4().hex}.tmp"
+    df.to_pickle(tmp, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, ruta)
+    return df
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from perezoso import Perezoso
+
+np = Perezoso("numpy", globals())
+pd = Perezoso("pandas", globals())
+
+# Inventario por usuario en formato columnar: un .npy por columna (se abre con mmap),
+# columnas de texto codificadas como diccionario (códigos int32 + categorías en un pickle al lado,
+# que conserva cualquier valor de celda: fechas, números mezclados con texto...).
+#
+#   uploads/{user_id}_inventario/actual        -> nombre de la versión vigente
+#   uploads/{user_id}_inventario/v{n}/meta.json
+#   uploads/{user_id}_inventario/v{n}/{i}.npy  (+ {i}.categorias.pkl, _index.npy)
+
+
+def _carpeta(base: str, user_id: str) -> str:
+    return os.path.join(base, f"{user_id}_inventario")
+
+
+def version_actual(base: str, user_id: str) -> Optional[str]:
+    try:
+        with open(os.path.join(_carpeta(base, user_id), "actual")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _guardar_categorias(carpeta: str, info: dict, i: int, categorias) -> None:
+    info["tipo"], info["archivo_categorias"] = "categoria", f"{i}.categorias.pkl"
+    pd.to_pickle(categorias, os.path.join(carpeta, info["archivo_categorias"]))
+
+
+def _cargar_categorias(carpeta: str, info: dict):
+    return pd.read_pickle(os.path.join(carpeta, info["archivo_categorias"]))
+
+
+def guardar_inventario(df: pd.DataFrame, base: str, user_id: str) -> str:
+    carpeta = _carpeta(base, user_id)
+    previa = version_actual(base, user_id)
+    version = f"v{int(previa[1:]) + 1 if previa else 1}"
+    destino = os.path.join(carpeta, version)
+    tmp = os.path.join(carpeta, f".{version}.{uuid.uuid4().hex}")
+    os.makedirs(tmp)
+    meta = {"filas": int(len(df)), "columnas": []}
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        info = {"nombre": col, "archivo": f"{i}.npy"}
+        if col == "peso_espacio":
+            info["tipo"] = "int8"
+            arr = s.to_numpy(dtype=np.int8)
+        elif isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.cat.remove_unused_categories()
+            _guardar_categorias(tmp, info, i, s.cat.categories)
+            arr = s.cat.codes.to_numpy(dtype=np.int32)
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            info["tipo"] = "fecha"
+            arr = s.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            info["tipo"] = "numero"
+            arr = s.to_numpy()
+        else:
+            cat = pd.Categorical(s)
+            _guardar_categorias(tmp, info, i, cat.categories)
+            arr = cat.codes.astype(np.int32)
+        np.save(os.path.join(tmp, info["archivo"]), arr)
+        meta["columnas"].append(info)
+    np.save(os.path.join(tmp, "_index.npy"), df.index.to_numpy(dtype=np.int64))
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, destino)
+    puntero = os.path.join(carpeta, f".actual.{uuid.uuid4().hex}")
+    with open(puntero, "w") as f:
+        f.write(version)
+    os.replace(puntero, os.path.join(carpeta, "actual"))
+    for nombre in os.listdir(carpeta):
+        if nombre.startswith("v") and nombre != version:
+            shutil.rmtree(os.path.join(carpeta, nombre), ignore_errors=True)
+    return version
+
+
+def cargar_inventario(base: str, user_id: str, columnas: Optional[List[str]] = None,
+                      version: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """Abre el inventario vigente (o `version`, si aún existe) con mmap; solo se leen las columnas pedidas."""
+    version = version or version_actual(base, user_id)
+    if version is None: return None
+    ruta = os.path.join(_carpeta(base, user_id), version)
+    try:
+        with open(os.path.join(ruta, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    datos = {}
+    for info in meta["columnas"]:
+        if columnas is not None and info["nombre"] not in columnas: continue
+        arr = np.load(os.path.join(ruta, info["archivo"]), mmap_mode="r")
+        if info["tipo"] == "categoria":
+            categorias = _cargar_categorias(ruta, info)
+            datos[info["nombre"]] = pd.Categorical.from_codes(arr, categories=categorias) \
+                if len(categorias) else pd.Categorical([np.nan] * len(arr))
+        elif info["tipo"] == "fecha":
+            datos[info["nombre"]] = arr.view("datetime64[ns]")
+        else:
+            datos[info["nombre"]] = arr
+    indice = pd.Index(np.load(os.path.join(ruta, "_index.npy"), mmap_mode="r"))
+    return pd.DataFrame(datos, index=indice, copy=False)
+
+
+def tocar_inventario(base: str, user_id: str) -> None:
+    # La fecha del puntero `actual` marca el último uso (la limpieza por TTL se guía por ella)
+    try:
+        os.utime(os.path.join(_carpeta(base, user_id), "actual"))
+    except OSError:
+        pass
+
+
+class CacheInventarios:
+    """LRU en proceso de inventarios ya abiertos, por (usuario, versión, columnas), acotada por bytes.
+
+    Los DataFrames devueltos se comparten entre peticiones: no se deben modificar.
+    """
+
+    def __init__(self, base: str, max_bytes: int):
+        self.base, self.max_bytes = base, max_bytes
+        self.aciertos = self.fallos = self.bytes = 0
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[tuple, Tuple[pd.DataFrame, int]]" = OrderedDict()
+
+    def cargar(self, user_id: str, columnas: Optional[List[str]] = None) -> Tuple[Optional[str], Optional[pd.DataFrame]]:
+        """(versión, inventario) vigentes del usuario; (None, None) si no hay."""
+        version = version_actual(self.base, user_id)
+        if version is None: return None, None
+        clave = (user_id, version, tuple(columnas) if columnas is not None else None)
+        with self._lock:
+            item = self._items.get(clave)
+            if item is not None:
+                self._items.move_to_end(clave)
+                self.aciertos += 1
+        if item is None:
+            df = cargar_inventario(self.base, user_id, columnas, version)
+            if df is None: return None, None
+            tam = int(df.memory_usage(index=True).sum())
+            with self._lock:
+                self.fallos += 1
+                if tam <= self.max_bytes and clave not in self._items:
+                    self._items[clave] = (df, tam)
+                    self.bytes += tam
+                    while self.bytes > self.max_bytes: self.bytes -= self._items.popitem(last=False)[1][1]
+            item = (df, tam)
+        tocar_inventario(self.base, user_id)
+        return version, item[0]
+
+    def olvidar(self, user_id: str) -> None:
+        with self._lock:
+            for clave in [c for c in self._items if c[0] == user_id]:
+                self.bytes -= self._items.pop(clave)[1]
+
+
+def borrar_archivos_usuario(base: str, user_id: Optional[str]) -> None:
+    # Inventario columnar y cualquier otro archivo {user_id}_* (p. ej. pickles antiguos)
+    if not user_id: return
+    for nombre in os.listdir(base):
+        if not nombre.startswith(f"{user_id}_"): continue
+        ruta = os.path.join(base, nombre)
+        if os.path.isdir(ruta):
+            shutil.rmtree(ruta, ignore_errors=True)
+        else:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
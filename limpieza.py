@@ -0,0 +1,90 @@
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Optional
+
+# Lo que nunca se barre aunque no se use (el almacén de sesiones tiene su propia expiración)
+PROTEGIDOS = ("_sesiones.sqlite3", ".gitkeep")
+# Carpetas compartidas: se barre archivo por archivo
+CARPETAS_CACHE = ("_informes", "_perfiles")
+
+
+def _tamano(ruta: str) -> int:
+    if os.path.isfile(ruta): return os.path.getsize(ruta)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(ruta) for f in fs)
+
+
+def _ultimo_uso(ruta: str) -> float:
+    # Inventario columnar: la fecha del puntero `actual` (se toca en cada carga)
+    puntero = os.path.join(ruta, "actual")
+    return os.path.getmtime(puntero if os.path.exists(puntero) else ruta)
+
+
+class Conserje:
+    """Hilo de fondo que borra de `base` lo que lleva más de `ttl_seg` sin usarse.
+
+    Cubre los archivos por usuario ({user_id}_*) que quedan huérfanos cuando la sesión
+    no se cerró ni se purgó (reinicios, caídas), y las cachés compartidas en disco.
+    """
+
+    def __init__(self, base: str, ttl_seg: float, intervalo_seg: float = 600,
+                 antes_de_barrer: Optional[Callable[[], None]] = None):
+        self.base, self.ttl_seg, self.intervalo_seg = base, ttl_seg, intervalo_seg
+        self.antes_de_barrer = antes_de_barrer
+        self.archivos_borrados = self.bytes_recuperados = 0
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._pid = None
+
+    def asegurar(self) -> None:
+        """Arranca el hilo si no corre en este proceso (tras un fork el hilo no se hereda)."""
+        if self._hilo is not None and self._pid == os.getpid(): return
+        with self._lock:
+            if self._hilo is not None and self._pid == os.getpid(): return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._bucle, name="conserje", daemon=True)
+            self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            time.sleep(self.intervalo_seg)
+            try:
+                self.barrer()
+            except Exception:
+                pass
+
+    def _borrar(self, ruta: str) -> None:
+        try:
+            tam = _tamano(ruta)
+            if os.path.isdir(ruta): shutil.rmtree(ruta)
+            else: os.remove(ruta)
+        except OSError:
+            return
+        with self._lock:
+            self.archivos_borrados += 1
+            self.bytes_recuperados += tam
+
+    def barrer(self, ahora: Optional[float] = None) -> int:
+        """Una pasada; devuelve los bytes liberados."""
+        if self.antes_de_barrer is not None: self.antes_de_barrer()
+        limite = (ahora or time.time()) - self.ttl_seg
+        antes = self.bytes_recuperados
+        try:
+            nombres = os.listdir(self.base)
+        except FileNotFoundError:
+            return 0
+        for nombre in nombres:
+            ruta = os.path.join(self.base, nombre)
+            try:
+                if nombre in CARPETAS_CACHE:
+                    for archivo in os.listdir(ruta):
+                        sub = os.path.join(ruta, archivo)
+                        if os.path.getmtime(sub) < limite: self._borrar(sub)
+                elif nombre.startswith(PROTEGIDOS) or nombre.startswith((".", "_")):
+                    continue
+                elif _ultimo_uso(ruta) < limite:
+                    self._borrar(ruta)
+            except OSError:
+                continue
+        return self.bytes_recuperados - antes
@@ -0,0 +1,191 @@
+import bisect
+import cProfile
+import contextvars
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+try:
+    import resource  # solo Unix; en Windows (run.bat) la memoria del proceso se reporta en 0
+except ImportError:
+    resource = None
+
+BUCKETS_SEG = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BUCKETS_CANTIDAD = (10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000)
+BUCKETS_CELDAS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+
+def _cita(valor) -> str:
+    return '"' + str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def _etiquetas(pares: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    partes = [f"{k}={_cita(v)}" for k, v in pares]
+    if extra: partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, buckets):
+        self.nombre, self.ayuda, self.buckets = nombre, ayuda, tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # etiquetas -> [conteos por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **etiquetas) -> None:
+        clave = tuple(sorted(etiquetas.items()))
+        i = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.setdefault(clave, [0] * len(self.buckets) + [0.0, 0])
+            if i < len(self.buckets): serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exponer(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for clave, serie in sorted(series.items()):
+            acumulado = 0
+            for b, n in zip(self.buckets, serie):
+                acumulado += n
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(clave, 'le=%s' % _cita(f'{b:g}'))} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(clave, 'le=%s' % _cita('+Inf'))} {serie[-1]}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(clave)} {serie[-2]:.6f}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(clave)} {serie[-1]}")
+        return lineas
+
+
+class Medidor:
+    """Valor calculado al exponer (gauge, o counter si `fn` solo crece)."""
+
+    def __init__(self, nombre: str, ayuda: str, fn, tipo: str = "gauge"):
+        self.nombre, self.ayuda, self.fn, self.tipo = nombre, ayuda, fn, tipo
+
+    def exponer(self) -> list:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}", f"{self.nombre} {self.fn()}"]
+
+
+def memoria_pico_bytes() -> int:
+    """Pico de memoria residente del proceso desde que arrancó (solo crece)."""
+    if resource is None: return 0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024  # macOS: bytes; Linux: KB
+
+
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def memoria_actual_bytes() -> int:
+    """Memoria residente actual (Linux, /proc); 0 donde no está disponible."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGINA
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+# Con MEMORIA_TRAZADA=1 cada petición reporta su pico de memoria de Python/numpy (tracemalloc).
+# El trazado cuesta tiempo en cada asignación: solo para diagnosticar. Con peticiones simultáneas
+# el pico de una incluye lo que asignan las demás.
+if os.environ.get("MEMORIA_TRAZADA", "0") == "1" and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = OrderedDict()
+
+    def agregar(self, metrica):
+        self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def exponer(self) -> str:
+        return "\n".join(l for m in self._metricas.values() for l in m.exponer()) + "\n"
+
+
+REGISTRO = Registro()
+ETAPA_SEG = REGISTRO.agregar(Histograma(
+    "planer_etapa_segundos", "Tiempo por etapa del flujo (total por petición o trabajo)", BUCKETS_SEG))
+PETICION_SEG = REGISTRO.agregar(Histograma("planer_peticion_segundos", "Duración de las peticiones HTTP", BUCKETS_SEG))
+VEHICULO_FILAS = REGISTRO.agregar(Histograma(
+    "planer_vehiculo_filas_candidatas", "Filas candidatas por vehículo tras filtrar ciudad y referencias", BUCKETS_CANTIDAD))
+VEHICULO_GRUPOS = REGISTRO.agregar(Histograma(
+    "planer_vehiculo_grupos_direccion", "Grupos de Dirección 1 que entran al optimizador por vehículo", BUCKETS_CANTIDAD))
+VEHICULO_CELDAS = REGISTRO.agregar(Histograma(
+    "planer_vehiculo_celdas_dp", "Celdas de la tabla del optimizador exacto por vehículo", BUCKETS_CELDAS))
+REGISTRO.agregar(Medidor("planer_memoria_pico_bytes", "Memoria residente máxima del proceso desde que arrancó",
+                         memoria_pico_bytes))
+
+
+class Medicion:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.rss_inicio = memoria_actual_bytes()
+        if tracemalloc.is_tracing(): tracemalloc.reset_peak()
+        self.etapas: "OrderedDict[str, float]" = OrderedDict()
+
+    def server_timing(self) -> str:
+        partes = [f"{nombre};dur={seg * 1000:.1f}" for nombre, seg in self.etapas.items()]
+        partes.append(f"total;dur={(time.perf_counter() - self.inicio) * 1000:.1f}")
+        # Memoria de esta petición: variación de RSS y, con MEMORIA_TRAZADA=1, el pico asignado
+        memoria = f"rss_delta_mb={(memoria_actual_bytes() - self.rss_inicio) / 2**20:.1f}"
+        if tracemalloc.is_tracing(): memoria += f" pico_mb={tracemalloc.get_traced_memory()[1] / 2**20:.1f}"
+        partes.append(f'memoria;desc="{memoria}"')
+        return ", ".join(partes)
+
+
+_actual: contextvars.ContextVar = contextvars.ContextVar("medicion", default=None)
+
+
+def iniciar_medicion() -> Medicion:
+    m = Medicion()
+    _actual.set(m)
+    return m
+
+
+def terminar_medicion(m: Optional[Medicion]) -> None:
+    if m is None: return
+    for nombre, seg in m.etapas.items():
+        ETAPA_SEG.observar(seg, etapa=nombre)
+    _actual.set(None)
+
+
+@contextmanager
+def etapa(nombre: str):
+    """Acumula el tiempo del bloque en la medición activa (petición o trabajo)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        m = _actual.get()
+        if m is None:
+            ETAPA_SEG.observar(dt, etapa=nombre)
+        else:
+            m.etapas[nombre] = m.etapas.get(nombre, 0.0) + dt
+
+
+def observar_vehiculo(filas_candidatas: int, grupos: int, celdas_dp: int) -> None:
+    VEHICULO_FILAS.observar(filas_candidatas)
+    VEHICULO_GRUPOS.observar(grupos)
+    VEHICULO_CELDAS.observar(celdas_dp)
+
+
+def iniciar_perfil() -> cProfile.Profile:
+    perfil = cProfile.Profile()
+    perfil.enable()
+    return perfil
+
+
+def guardar_perfil(perfil: cProfile.Profile, carpeta: str, nombre: str) -> str:
+    """Detiene el perfil y lo vuelca en formato pstats (snakeviz, `python -m pstats`)."""
+    perfil.disable()
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, f"{time.strftime('%Y%m%d-%H%M%S')}_{nombre}.prof")
+    perfil.dump_stats(ruta)
+    return ruta
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from perezoso import Perezoso
+
+np = Perezoso("numpy", globals())
+
+
+class Solucion(NamedTuple):
+    ids: List[int]
+    peso: int
+    modo: str      # "exacto" | "heuristico"
+    brecha: float  # % por debajo de la cota superior (0 si es óptimo)
+    celdas: int = 0  # tamaño de la tabla del DP (0 si no se intentó)
+
+
+def knapsack_max_peso_min_items(items: List[dict], capacidad: int,
+                                limite: Optional[float] = None) -> Optional[Tuple[List[int], int]]:
+    # Máximo peso y, a igual peso, menos grupos; los empates se resuelven como el DP original
+    # (ítems en orden, solo mejoras estrictas, primera capacidad con el máximo).
+    # (peso, -items) se codifica en un solo entero: peso * (n + 1) + (n - items).
+    # Devuelve None si se pasa de `limite` (perf_counter).
+    n = len(items)
+    base = n + 1
+    dp = np.full(capacidad + 1, n, dtype=np.int64)
+    tomado = np.zeros((n, capacidad + 1), dtype=bool)
+    pesos = [int(item["peso"]) for item in items]
+    for i, w in enumerate(pesos):
+        if w > capacidad: continue
+        if limite is not None and time.perf_counter() > limite: return None
+        cand = dp[:capacidad + 1 - w] + (w * base - 1)
+        mejora = tomado[i, w:]
+        np.greater(cand, dp[w:], out=mejora)
+        np.copyto(dp[w:], cand, where=mejora)
+    best_c = int(np.argmax(dp))
+    ids, c = [], best_c
+    for i in range(n - 1, -1, -1):
+        if tomado[i, c]:
+            ids.append(items[i]["id"])
+            c -= pesos[i]
+    ids.reverse()
+    return ids, int(dp[best_c] // base)
+
+
+def _agrupar_por_peso(items: List[dict], capacidad: int) -> Tuple[List[int], List[List[int]]]:
+    # Grupos con el mismo peso son intercambiables: se guardan como un ítem con cantidad.
+    clases = {}
+    for item in items:
+        w = int(item["peso"])
+        if 0 < w <= capacidad:
+            clases.setdefault(w, []).append(item["id"])
+    pesos = sorted(clases)
+    return pesos, [clases[w] for w in pesos]
+
+
+def _dp_acotado(pesos, ids_por_peso, capacidad, limite):
+    # Knapsack acotado con división binaria (1, 2, 4, ..., resto) de cada cantidad. Mismo peso y
+    # número de grupos que el DP por ítem, pero entre grupos del mismo peso elige los de id menor,
+    # así que ante empates puede elegir otro conjunto que el original.
+    # Devuelve cuántos ítems tomar de cada peso, o None si se agota el tiempo.
+    partes = []
+    for k, (w, ids) in enumerate(zip(pesos, ids_por_peso)):
+        restante, m = min(len(ids), capacidad // w), 1
+        while restante > 0:
+            m = min(m, restante)
+            partes.append((k, m, w * m))
+            restante -= m
+            m *= 2
+    total = sum(m for _, m, _ in partes)
+    base = total + 1
+    dp = np.full(capacidad + 1, total, dtype=np.int64)
+    tomado = np.zeros((len(partes), capacidad + 1), dtype=bool)
+    for i, (_, m, w) in enumerate(partes):
+        if time.perf_counter() > limite: return None
+        cand = dp[:capacidad + 1 - w] + (w * base - m)
+        mejora = tomado[i, w:]
+        np.greater(cand, dp[w:], out=mejora)
+        np.copyto(dp[w:], cand, where=mejora)
+    cantidades = [0] * len(pesos)
+    c = int(np.argmax(dp))
+    for i in range(len(partes) - 1, -1, -1):
+        if tomado[i, c]:
+            k, m, w = partes[i]
+            cantidades[k] += m
+            c -= w
+    return cantidades
+
+
+def _voraz_con_mejora(pesos, ids_por_peso, capacidad, limite):
+    # Primero los pesos grandes; luego intercambios 1 por 1 que aprovechen la holgura.
+    cantidades = [0] * len(pesos)
+    libre = capacidad
+    for k in range(len(pesos) - 1, -1, -1):
+        cantidades[k] = min(len(ids_por_peso[k]), libre // pesos[k])
+        libre -= cantidades[k] * pesos[k]
+    mejoro = True
+    while mejoro and libre > 0 and time.perf_counter() <= limite:
+        mejoro = False
+        for a in range(len(pesos)):
+            if cantidades[a] == 0: continue
+            for b in range(len(pesos) - 1, a, -1):
+                delta = pesos[b] - pesos[a]
+                if delta <= libre and cantidades[b] < len(ids_por_peso[b]):
+                    cantidades[a] -= 1
+                    cantidades[b] += 1
+                    libre -= delta
+                    mejoro = True
+                    break
+            if mejoro: break
+    return cantidades
+
+
+def resolver_vehiculo(items: List[dict], capacidad: int, presupuesto_seg: float, max_celdas: int) -> Solucion:
+    """Grupos a cargar en un vehículo: máximo peso y, a igual peso, menos grupos.
+
+    Si la tabla por ítem cabe en `max_celdas` se usa el DP original (mismos desempates); si no,
+    el DP acotado por peso, y si tampoco cabe o se agota el tiempo, el voraz con mejora.
+    """
+    validos = [item for item in items if 0 < int(item["peso"]) <= capacidad]
+    if not validos: return Solucion([], 0, "exacto", 0.0)
+    cota = min(capacidad, sum(int(item["peso"]) for item in validos))
+    limite = time.perf_counter() + presupuesto_seg
+    celdas = len(validos) * (capacidad + 1)
+    if celdas <= max_celdas:
+        res = knapsack_max_peso_min_items(validos, capacidad, limite)
+        if res is not None:
+            return Solucion(sorted(res[0]), res[1], "exacto", 0.0, celdas)
+    pesos, ids_por_peso = _agrupar_por_peso(validos, capacidad)
+    partes = sum(int(min(len(ids), capacidad // w)).bit_length() for w, ids in zip(pesos, ids_por_peso))
+    cantidades, celdas = None, partes * (capacidad + 1)
+    if celdas <= max_celdas:
+        cantidades = _dp_acotado(pesos, ids_por_peso, capacidad, limite)
+    else:
+        celdas = 0
+    modo = "exacto"
+    if cantidades is None:
+        modo = "heuristico"
+        cantidades = _voraz_con_mejora(pesos, ids_por_peso, capacidad, limite)
+    ids = sorted(i for k, cant in enumerate(cantidades) for i in ids_por_peso[k][:cant])
+    peso = sum(w * cant for w, cant in zip(pesos, cantidades))
+    brecha = 0.0 if modo == "exacto" or peso >= cota else (cota - peso) / cota * 100
+    return Solucion(ids, peso, modo, brecha, celdas)
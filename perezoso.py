@@ -0,0 +1,43 @@
+import importlib
+import threading
+
+# Importación diferida de dependencias pesadas (pandas, numpy, xlsxwriter): la página de login y el
+# arranque de cada worker no las necesitan. `app.precargar()` las fuerza en el proceso maestro de
+# gunicorn (--preload) para que los workers las hereden ya importadas.
+
+
+class Perezoso:
+    """Se comporta como el módulo `nombre`; lo importa en el primer acceso a un atributo.
+
+    Con `espacio=globals()`, al cargar reemplaza el marcador por el módulo real en ese módulo,
+    así los accesos siguientes no pasan por aquí.
+    """
+
+    _todos: list = []
+
+    def __init__(self, nombre: str, espacio: dict = None):
+        self._nombre, self._espacio = nombre, espacio
+        self._modulo = None
+        self._lock = threading.Lock()
+        Perezoso._todos.append(self)
+
+    @classmethod
+    def cargar_todos(cls) -> None:
+        for p in list(cls._todos): p.cargar()
+
+    def cargar(self):
+        if self._modulo is None:
+            with self._lock:
+                if self._modulo is None:
+                    modulo = importlib.import_module(self._nombre)
+                    if self._espacio is not None:
+                        for k, v in list(self._espacio.items()):
+                            if v is self: self._espacio[k] = modulo
+                    self._modulo = modulo
+        return self._modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._modulo or self.cargar(), atributo)
+
+    def __repr__(self):
+        return f"<perezoso {self._nombre} {'cargado' if self._modulo is not None else 'sin cargar'}>"
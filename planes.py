@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+from metricas import etapa, observar_vehiculo
+from optimizador import Solucion, resolver_vehiculo
+from perezoso import Perezoso
+
+np = Perezoso("numpy", globals())
+pd = Perezoso("pandas", globals())
+
+# Campos del vehículo que cambian la asignación (placa, conductor, etc. solo van al encabezado)
+CAMPOS_ASIGNACION = ("ciudades", "cantidad_motos", "modo_carga", "refs_permitidas")
+
+
+class AsignacionVehiculo(NamedTuple):
+    filas: np.ndarray  # etiquetas del índice del inventario asignadas al vehículo
+    sol: Solucion
+
+
+class Paso(NamedTuple):
+    asignacion: AsignacionVehiculo
+    removidas: np.ndarray  # punto de control: mapa de bits (np.packbits) de filas ya asignadas tras este vehículo
+
+    def mascara(self, n: int) -> np.ndarray:
+        return np.unpackbits(self.removidas, count=n).astype(bool)
+
+
+def _pares_especiales(ciudades, cods) -> Tuple[np.ndarray, List[str]]:
+    # Código del par (ciudad, COD INT) de cada fila especial y su clave "CIUDAD_COD INT", como se marca
+    # en refs_permitidas; cada par distinto se arma una sola vez
+    c_cod, c_uni = pd.factorize(ciudades)
+    r_cod, r_uni = pd.factorize(cods)
+    codigos, pares = pd.factorize((c_cod + 1) * (len(r_uni) + 1) + (r_cod + 1))
+    nombres, refs = [""] + [str(c).upper() for c in c_uni], ["nan"] + [str(r) for r in r_uni]
+    return codigos, [f"{nombres[p // (len(r_uni) + 1)]}_{refs[p % (len(r_uni) + 1)]}" for p in pares]
+
+
+def _regla_permitidos(especial: np.ndarray, par: np.ndarray, claves: List[str], modo: str, permitidas) -> np.ndarray:
+    # Reglas de modo_carga + referencias especiales marcadas; `par` y `claves` son los de las filas especiales
+    if modo == "normales": return ~especial
+    ok = especial.copy() if modo == "especiales" else np.ones(len(especial), dtype=bool)
+    if especial.any():
+        permitidas = set(permitidas)
+        ok[especial] = np.array([c in permitidas for c in claves], dtype=bool)[par]
+    return ok
+
+
+def mascara_permitidos(posibles: pd.DataFrame, modo: str, permitidas) -> np.ndarray:
+    especial = posibles["peso_espacio"].to_numpy() > 1
+    par, claves = None, []
+    if modo != "normales" and especial.any():
+        par, claves = _pares_especiales(posibles["Descr EXXIT"].to_numpy()[especial],
+                                        posibles["COD INT"].to_numpy()[especial])
+    return _regla_permitidos(especial, par, claves, modo, permitidas)
+
+
+class IndiceInventario:
+    """Índices de una versión del inventario, armados una vez por plan.
+
+    Cada vehículo consulta solo las filas de sus ciudades (ya ordenadas por Reserva y Dirección 1) y
+    las ya asignadas se marcan en una máscara, así que su costo depende de sus candidatas y no del
+    inventario completo. Reproduce el filtro, orden y agrupación de la versión con DataFrames.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        n = len(df)
+        cod_ciudad, ciudades = pd.factorize(df["Descr EXXIT"].str.upper())
+        self.ciudad_de = {c: i for i, c in enumerate(ciudades)}
+        # Mismo orden que sort_values(["Reserva", "Dirección 1"]) (estable), aplicado a todo el inventario
+        orden = df[["Reserva", "Dirección 1"]].reset_index(drop=True).sort_values(["Reserva", "Dirección 1"]).index.to_numpy()
+        self.rango = np.empty(n, dtype=np.int64)
+        self.rango[orden] = np.arange(n)
+        por_ciudad = orden[np.argsort(cod_ciudad[orden], kind="stable")]
+        cortes = np.searchsorted(np.sort(cod_ciudad), np.arange(len(ciudades) + 1))
+        self.posiciones = [por_ciudad[cortes[i]:cortes[i + 1]] for i in range(len(ciudades))]
+        # Código de dirección en el orden de groupby("Dirección 1"); -1 = vacía
+        self.direccion = pd.factorize(df["Dirección 1"], sort=True)[0]
+        self.peso = df["peso_espacio"].to_numpy(dtype=np.int64)
+        # Filas especiales: par "CIUDAD_COD INT" con el que se marcan en refs_permitidas
+        self.par, self.claves_par = np.full(n, -1, dtype=np.int64), []
+        especial = np.flatnonzero(self.peso > 1)
+        if len(especial):
+            self.par[especial], self.claves_par = _pares_especiales(df["Descr EXXIT"].to_numpy()[especial],
+                                                                    df["COD INT"].to_numpy()[especial])
+        self.etiquetas = df.index.to_numpy()
+
+    def candidatas(self, ciudades, asignadas: np.ndarray) -> np.ndarray:
+        """Posiciones no asignadas en esas ciudades, en orden (Reserva, Dirección 1)."""
+        partes = [self.posiciones[self.ciudad_de[c]] for c in dict.fromkeys(ciudades) if c in self.ciudad_de]
+        if not partes: return np.zeros(0, dtype=np.int64)
+        pos = np.concatenate(partes)
+        if len(partes) > 1: pos = pos[np.argsort(self.rango[pos])]
+        return pos[~asignadas[pos]]
+
+    def permitidos(self, pos: np.ndarray, modo: str, permitidas) -> np.ndarray:
+        especial = self.peso[pos] > 1
+        if modo == "normales" or not especial.any(): return _regla_permitidos(especial, None, [], modo, permitidas)
+        # Solo se evalúan los pares de estas candidatas, no todos los del inventario
+        pares, inversa = np.unique(self.par[pos[especial]], return_inverse=True)
+        return _regla_permitidos(especial, inversa, [self.claves_par[p] for p in pares], modo, permitidas)
+
+
+def planear(df: pd.DataFrame, vehiculos: List[dict], presupuesto_seg: float, max_celdas: int,
+            removidas: Optional[np.ndarray] = None, indice: Optional[IndiceInventario] = None) -> List[AsignacionVehiculo]:
+    # Asigna la cola de vehículos en orden sobre las filas de `df` no marcadas en `removidas`; no escribe nada.
+    if indice is None:
+        with etapa("indice_inventario"):
+            indice = IndiceInventario(df)
+    asignadas = np.zeros(len(df), dtype=bool) if removidas is None else removidas.copy()
+    plan = []
+    for v in vehiculos:
+        cap = v["cantidad_motos"]
+        with etapa("filtro_candidatos"):
+            pos = indice.candidatas(v["ciudades"], asignadas)
+            pos = pos[indice.permitidos(pos, v["modo_carga"], v["refs_permitidas"])]
+        with etapa("agrupacion"):
+            con_dir = pos[indice.direccion[pos] >= 0]
+            dirs, grupo = np.unique(indice.direccion[con_dir], return_inverse=True)
+            pesos = np.bincount(grupo, weights=indice.peso[con_dir], minlength=len(dirs)).astype(np.int64)
+            items = [{"id": i, "peso": int(w)} for i, w in enumerate(pesos) if w <= cap]
+        with etapa("knapsack"):
+            sol = resolver_vehiculo(items, cap, presupuesto_seg, max_celdas)
+        observar_vehiculo(len(pos), len(dirs), sol.celdas)
+        filas = np.zeros(0, dtype=np.int64)
+        if sol.peso > 0:
+            with etapa("asignacion"):
+                por_grupo = con_dir[np.argsort(grupo, kind="stable")]
+                cuenta = np.bincount(grupo, minlength=len(dirs))
+                inicio = np.cumsum(cuenta) - cuenta
+                filas = np.concatenate([por_grupo[inicio[g]:inicio[g] + cuenta[g]] for g in sol.ids])
+                asignadas[filas] = True
+        plan.append(AsignacionVehiculo(indice.etiquetas[filas], sol))
+    return plan
+
+
+def pasos_desde(df: pd.DataFrame, plan: List[AsignacionVehiculo], removidas: Optional[np.ndarray] = None) -> List[Paso]:
+    """Puntos de control en orden de cola: filas asignadas acumuladas tras cada vehículo."""
+    removidas = np.zeros(len(df), dtype=bool) if removidas is None else removidas.copy()
+    pasos = []
+    for a in plan:
+        if len(a.filas): removidas[df.index.get_indexer(a.filas)] = True
+        pasos.append(Paso(a, np.packbits(removidas)))
+    return pasos
+
+
+def huellas_cola(vehiculos: List[dict]) -> List[str]:
+    # Huella encadenada: la i-ésima identifica el prefijo 0..i de la cola (la asignación es secuencial)
+    huellas, previa = [], b""
+    for v in vehiculos:
+        datos = json.dumps([v.get(c) for c in CAMPOS_ASIGNACION], sort_keys=True, default=str)
+        previa = hashlib.sha256(previa + datos.encode("utf-8")).digest()
+        huellas.append(previa.hex())
+    return huellas
+
+
+def huellas_globales(vehiculos: List[dict]) -> List[str]:
+    # En la asignación global cada vehículo depende de toda la cola: ningún prefijo se reutiliza
+    total = huellas_cola(vehiculos)[-1] if vehiculos else ""
+    return [hashlib.sha256(f"global|{total}|{i}".encode("utf-8")).hexdigest() for i in range(len(vehiculos))]
+
+
+def _tamano_paso(paso: Paso) -> int:
+    return paso.asignacion.filas.nbytes + paso.removidas.nbytes + 8 * len(paso.asignacion.sol.ids)
+
+
+class CachePlanes:
+    """LRU en memoria de pasos ya calculados, por (usuario, versión del inventario) y prefijo de la cola,
+    acotada por bytes.
+
+    Al editar o quitar el vehículo k, los pasos 0..k-1 siguen valiendo y el plan se reanuda desde el
+    punto de control del paso k-1. Se descartan versiones enteras: sin sus primeros pasos el resto no sirve.
+    """
+
+    def __init__(self, max_bytes: int, pasos_por_version: int = 512):
+        self.max_bytes, self.pasos_por_version = max_bytes, pasos_por_version
+        self.aciertos = self.parciales = self.fallos = self.pasos_reutilizados = self.bytes = 0
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[tuple, OrderedDict[str, Tuple[Paso, int]]]" = OrderedDict()
+        self._notas: dict = {}  # (usuario, versión) -> {clave: valor}, se descartan junto con la versión
+
+    def prefijo(self, user_id: str, version: str, huellas: List[str]) -> List[Paso]:
+        """Pasos guardados del prefijo común más largo de la cola."""
+        pasos = []
+        with self._lock:
+            por_version = self._items.get((user_id, version))
+            if por_version is not None:
+                self._items.move_to_end((user_id, version))
+                for h in huellas:
+                    item = por_version.get(h)
+                    if item is None: break
+                    por_version.move_to_end(h)
+                    pasos.append(item[0])
+            if huellas and len(pasos) == len(huellas): self.aciertos += 1
+            elif pasos: self.parciales += 1
+            else: self.fallos += 1
+            self.pasos_reutilizados += len(pasos)
+        return pasos
+
+    def guardar(self, user_id: str, version: str, pasos: List[Tuple[str, Paso]]) -> None:
+        with self._lock:
+            por_version = self._items.setdefault((user_id, version), OrderedDict())
+            self._items.move_to_end((user_id, version))
+            for h, paso in pasos:
+                previo = por_version.pop(h, None)
+                if previo is not None: self.bytes -= previo[1]
+                por_version[h] = (paso, _tamano_paso(paso))
+                self.bytes += por_version[h][1]
+            while len(por_version) > self.pasos_por_version: self.bytes -= por_version.popitem(last=False)[1][1]
+            while self.bytes > self.max_bytes and self._items:
+                clave, descartados = self._items.popitem(last=False)
+                self.bytes -= sum(tam for _, tam in descartados.values())
+                self._notas.pop(clave, None)
+
+    def anotar(self, user_id: str, version: str, clave: str, valor) -> None:
+        with self._lock:
+            if (user_id, version) in self._items: self._notas.setdefault((user_id, version), {})[clave] = valor
+
+    def nota(self, user_id: str, version: str, clave: str):
+        with self._lock:
+            return self._notas.get((user_id, version), {}).get(clave)
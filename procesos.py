@@ -0,0 +1,15 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+
+def pool_procesos(procesos: int, precarga: List[str]) -> ProcessPoolExecutor:
+    """Pool de procesos con forkserver (spawn donde no existe) que importa `precarga` una sola vez.
+
+    forkserver: los hijos no heredan hilos ni locks del servidor web. El servidor de forks es uno
+    por proceso y la precarga solo cuenta antes de arrancarlo (con el primer pool).
+    """
+    metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    ctx = multiprocessing.get_context(metodo)
+    if metodo == "forkserver": ctx.set_forkserver_preload(precarga)
+    return ProcessPoolExecutor(max_workers=procesos, mp_context=ctx)
@@ -0,0 +1,217 @@
+import abc
+import os
+import pickle
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+def serializar(datos: dict) -> bytes:
+    return zlib.compress(pickle.dumps(datos, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def deserializar(blob: bytes) -> dict:
+    return pickle.loads(zlib.decompress(blob))
+
+
+class AlmacenSesiones(abc.ABC):
+    """Backend de sesiones del lado del servidor. Guarda bytes ya serializados."""
+
+    @abc.abstractmethod
+    def cargar(self, sid: str) -> Optional[bytes]: ...
+
+    @abc.abstractmethod
+    def guardar(self, sid: str, blob: bytes, expira: float) -> None: ...
+
+    @abc.abstractmethod
+    def tocar(self, sid: str, expira: float) -> None:
+        """Solo mueve el vencimiento (peticiones que no cambian la sesión)."""
+
+    @abc.abstractmethod
+    def borrar(self, sid: str) -> None: ...
+
+    @abc.abstractmethod
+    def expiradas(self, ahora: float) -> list: ...  # [(sid, blob)]
+
+
+class AlmacenSQLite(AlmacenSesiones):
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion, self._pid = None, None
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("CREATE TABLE IF NOT EXISTS sesiones (sid TEXT PRIMARY KEY, datos BLOB, expira REAL)")
+        self._con.execute("CREATE INDEX IF NOT EXISTS sesiones_expira ON sesiones (expira)")
+
+    @property
+    def _con(self) -> sqlite3.Connection:
+        # Una conexión por proceso: con gunicorn --preload la app se importa antes del fork
+        if self._pid != os.getpid():
+            self._conexion = sqlite3.connect(self.ruta, check_same_thread=False, isolation_level=None)
+            self._pid = os.getpid()
+        return self._conexion
+
+    def cargar(self, sid):
+        with self._lock:
+            fila = self._con.execute("SELECT datos, expira FROM sesiones WHERE sid = ?", (sid,)).fetchone()
+        if fila is None or fila[1] < time.time(): return None
+        return fila[0]
+
+    def guardar(self, sid, blob, expira):
+        with self._lock:
+            self._con.execute("INSERT OR REPLACE INTO sesiones (sid, datos, expira) VALUES (?, ?, ?)", (sid, blob, expira))
+
+    def tocar(self, sid, expira):
+        with self._lock:
+            self._con.execute("UPDATE sesiones SET expira = ? WHERE sid = ?", (expira, sid))
+
+    def borrar(self, sid):
+        with self._lock:
+            self._con.execute("DELETE FROM sesiones WHERE sid = ?", (sid,))
+
+    def expiradas(self, ahora):
+        with self._lock:
+            return self._con.execute("SELECT sid, datos FROM sesiones WHERE expira < ?", (ahora,)).fetchall()
+
+
+class CacheLRU(AlmacenSesiones):
+    """LRU en memoria delante de otro almacén (escritura directa).
+
+    Los vencimientos de sesiones en caché se escriben en el almacén como mucho cada `renovar_cada_seg`.
+    """
+
+    def __init__(self, almacen: AlmacenSesiones, capacidad: int = 256, renovar_cada_seg: float = 60):
+        self.almacen, self.capacidad, self.renovar_cada_seg = almacen, capacidad, renovar_cada_seg
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _recordar(self, sid, blob, expira):
+        self._items[sid] = (blob, expira)
+        self._items.move_to_end(sid)
+        while len(self._items) > self.capacidad: self._items.popitem(last=False)
+
+    def cargar(self, sid):
+        with self._lock:
+            item = self._items.get(sid)
+            if item is not None and item[1] >= time.time():
+                self._items.move_to_end(sid)
+                return item[0]
+        return self.almacen.cargar(sid)
+
+    def guardar(self, sid, blob, expira):
+        self.almacen.guardar(sid, blob, expira)
+        with self._lock: self._recordar(sid, blob, expira)
+
+    def tocar(self, sid, expira):
+        with self._lock:
+            item = self._items.get(sid)
+            if item is not None and expira - item[1] < self.renovar_cada_seg: return
+        self.almacen.tocar(sid, expira)
+        with self._lock:
+            item = self._items.get(sid)
+            if item is not None: self._items[sid] = (item[0], expira)
+
+    def borrar(self, sid):
+        self.almacen.borrar(sid)
+        with self._lock: self._items.pop(sid, None)
+
+    def expiradas(self, ahora):
+        return self.almacen.expiradas(ahora)
+
+
+class SesionServidor(CallbackDict, SessionMixin):
+    def __init__(self, datos=None, sid=None, nueva=False, blob=None):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, datos, on_update)
+        self.sid, self.new, self.modified = sid, nueva, False
+        self.blob_original = blob  # para detectar cambios concurrentes al guardar
+        self.sid_anterior = None
+
+    def rotar(self):
+        """Id nuevo (p. ej. al iniciar sesión, contra fijación de sesión); el anterior se borra al guardar."""
+        if self.sid_anterior is None and not self.new: self.sid_anterior = self.sid
+        self.sid, self.new, self.blob_original, self.modified = secrets.token_urlsafe(32), True, None, True
+
+
+class InterfazSesionServidor(SessionInterface):
+    """La cookie solo lleva un id aleatorio; los datos viven en `almacen`.
+
+    `al_expirar(datos)` se llama con cada sesión vencida al purgarla (p. ej. para
+    borrar sus archivos de inventario). `purgar_expiradas` no se programa sola: en app.py
+    la corre el Conserje antes de cada barrida.
+    """
+
+    def __init__(self, almacen: AlmacenSesiones, ttl_seg: int, al_expirar: Callable[[dict], None] = None):
+        self.almacen, self.ttl_seg, self.al_expirar = almacen, ttl_seg, al_expirar
+        self._locks = [threading.Lock() for _ in range(64)]
+
+    def _lock_de(self, sid: str) -> threading.Lock:
+        return self._locks[hash(sid) % len(self._locks)]
+
+    def actualizar(self, sid: str, fn: Callable[[dict], None]) -> bool:
+        """Aplica `fn` sobre los datos guardados de la sesión de forma atómica."""
+        with self._lock_de(sid):
+            blob = self.almacen.cargar(sid)
+            if blob is None: return False
+            datos = deserializar(blob)
+            fn(datos)
+            self.almacen.guardar(sid, serializar(datos), time.time() + self.ttl_seg)
+        return True
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        blob = self.almacen.cargar(sid) if sid else None
+        if blob is None: return SesionServidor(sid=secrets.token_urlsafe(32), nueva=True)
+        return SesionServidor(deserializar(blob), sid=sid, blob=blob)
+
+    def save_session(self, app, session, response):
+        nombre, dominio, ruta = self.get_cookie_name(app), self.get_cookie_domain(app), self.get_cookie_path(app)
+        if session.sid_anterior is not None: self.almacen.borrar(session.sid_anterior)
+        if not session:
+            if session.modified:
+                self.almacen.borrar(session.sid)
+                response.delete_cookie(nombre, domain=dominio, path=ruta)
+            return
+        if not (session.modified or session.new):
+            # Sin cambios: no se reescriben los datos, pero la sesión sigue viva otros ttl_seg
+            self.almacen.tocar(session.sid, time.time() + self.ttl_seg)
+            if self.should_set_cookie(app, session): self._poner_cookie(app, session, response)
+            return
+        with self._lock_de(session.sid):
+            actual = self.almacen.cargar(session.sid)
+            datos = dict(session)
+            if actual is not None and session.blob_original is not None and actual != session.blob_original:
+                # Otro proceso (p. ej. un trabajo) guardó mientras tanto: solo se escriben
+                # las claves que esta petición cambió.
+                original, datos = deserializar(session.blob_original), deserializar(actual)
+                for k, v in session.items():
+                    if k not in original or original[k] != v: datos[k] = v
+                for k in original:
+                    if k not in session: datos.pop(k, None)
+            self.almacen.guardar(session.sid, serializar(datos), time.time() + self.ttl_seg)
+        self._poner_cookie(app, session, response)
+
+    def _poner_cookie(self, app, session, response):
+        response.set_cookie(self.get_cookie_name(app), session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), domain=self.get_cookie_domain(app),
+                            path=self.get_cookie_path(app), secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+    def purgar_expiradas(self) -> int:
+        vencidas = self.almacen.expiradas(time.time())
+        for sid, blob in vencidas:
+            if self.al_expirar is not None:
+                try:
+                    self.al_expirar(deserializar(blob))
+                except Exception:
+                    pass
+            self.almacen.borrar(sid)
+        return len(vencidas)
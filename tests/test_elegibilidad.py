@@ -0,0 +1,46 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import _pesos_equivalencia, equivalencias, get_equivalencia
+from benchmarks.referencia import peso_espacio_original, permitidos_original
+from planes import mascara_permitidos
+
+CODIGOS = ["AK200ZW", " ak200zw ", "ATUL RIK", "atul rik", "300AC", "", "  ", None, np.nan, 300, 300.0,
+           "HIMALAYAN 452", "AK125T-4", "DESCONOCIDO"]
+
+
+def _inventario(n, seed):
+    r = random.Random(seed)
+    especiales = [c for c in equivalencias if equivalencias[c] > 1][:6]
+    cods = [r.choice(especiales + ["N1", "N2", 300, None]) for _ in range(n)]
+    df = pd.DataFrame({"Descr EXXIT": [r.choice(["Bogota", "CALI", "cali", "MEDELLIN"]) for _ in range(n)],
+                       "COD INT": pd.Series(cods, dtype=object)})
+    df["peso_espacio"] = _pesos_equivalencia(df["COD INT"])
+    return df.set_index(pd.Index(r.sample(range(10 * n), n)))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_pesos_iguales_al_original(seed):
+    r = random.Random(seed)
+    cods = pd.Series([r.choice(CODIGOS) for _ in range(300)], dtype=object)
+    esperado = peso_espacio_original(cods, get_equivalencia).to_numpy()
+    assert np.array_equal(_pesos_equivalencia(cods), esperado)
+
+
+def test_pesos_vacio():
+    assert len(_pesos_equivalencia(pd.Series([], dtype=object))) == 0
+
+
+@pytest.mark.parametrize("modo", ["todas", "normales", "especiales"])
+@pytest.mark.parametrize("fraccion", [0, .5, 1])
+@pytest.mark.parametrize("seed", range(3))
+def test_mascara_igual_al_original(modo, fraccion, seed):
+    r = random.Random(seed)
+    df = _inventario(400, seed)
+    pares = df.loc[df["peso_espacio"] > 1, ["Descr EXXIT", "COD INT"]].drop_duplicates()
+    permitidas = [f"{c.upper()}_{cod}" for c, cod in zip(pares["Descr EXXIT"], pares["COD INT"]) if r.random() < fraccion]
+    esperado = permitidos_original(df, modo, permitidas).to_numpy(dtype=bool)
+    assert np.array_equal(mascara_permitidos(df, modo, permitidas), esperado)
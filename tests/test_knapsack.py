@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from benchmarks.referencia import knapsack_original
+from optimizador import knapsack_max_peso_min_items, resolver_vehiculo
+
+
+def _items(n, seed):
+    r = random.Random(seed)
+    pesos = [1] * 70 + [2] * 20 + [3, 4, 6, 12] * 2 + [7, 9, 15, 40]
+    return [{"id": i, "peso": r.choice(pesos) * r.randint(1, 3)} for i in range(n)]
+
+
+@pytest.mark.parametrize("caso", range(200))
+def test_igual_al_original(caso):
+    r = random.Random(caso)
+    items, cap = _items(r.randint(0, 60), caso), r.randint(1, 130)
+    assert knapsack_max_peso_min_items(items, cap) == knapsack_original(items, cap)
+
+
+def test_pesos_fuera_de_rango():
+    items = [{"id": 0, "peso": 0}, {"id": 1, "peso": 50}, {"id": 2, "peso": 3}, {"id": 3, "peso": 3}]
+    assert knapsack_max_peso_min_items(items, 5) == knapsack_original(items, 5) == ([2], 3)
+
+
+def test_vacio():
+    assert knapsack_max_peso_min_items([], 10) == knapsack_original([], 10) == ([], 0)
+
+
+@pytest.mark.parametrize("caso", range(100))
+def test_resolver_vehiculo_mismos_grupos(caso):
+    r = random.Random(1000 + caso)
+    items, cap = _items(r.randint(1, 60), caso), r.randint(1, 130)
+    ids, peso = knapsack_original(items, cap)
+    sol = resolver_vehiculo(items, cap, 60, 10**9)
+    assert (sol.ids, sol.peso, sol.modo) == (sorted(ids), peso, "exacto")
+
+
+@pytest.mark.parametrize("caso", range(100))
+def test_resolver_vehiculo_acotado_y_heuristico(caso):
+    r = random.Random(2000 + caso)
+    items, cap = _items(r.randint(1, 60), caso), r.randint(1, 130)
+    ids, peso = knapsack_original(items, cap)
+    pesos = {item["id"]: item["peso"] for item in items}
+    exacto = resolver_vehiculo(items, cap, 60, 10**9)
+    # Sin celdas para el DP por ítem: DP acotado (mismo peso y número de grupos) o voraz
+    acot = resolver_vehiculo(items, cap, 60, exacto.celdas - 1)
+    if acot.modo == "exacto":
+        assert (acot.peso, len(acot.ids)) == (peso, len(ids))
+    heur = resolver_vehiculo(items, cap, 0, 0)
+    assert heur.modo == "heuristico" or heur.peso == 0
+    for sol in (acot, heur):
+        assert len(set(sol.ids)) == len(sol.ids) and sum(pesos[i] for i in sol.ids) == sol.peso <= peso
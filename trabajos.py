@@ -0,0 +1,90 @@
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+
+class Trabajo:
+    def __init__(self, propietario: str, total: int):
+        self.id = uuid.uuid4().hex
+        self.propietario = propietario
+        self.estado = "en_cola"  # en_cola | ejecutando | terminado | error
+        self.total, self.hechos = total, 0
+        self.detalle: list = []
+        self.resultado = None
+        self.error: Optional[str] = None
+        self.etapas: Dict[str, float] = {}  # ms por etapa, se llena al terminar
+        self.creado, self.terminado = time.time(), None
+
+    def avanzar(self, detalle: dict) -> None:
+        self.detalle.append(detalle)
+        self.hechos += 1
+
+    def a_dict(self) -> dict:
+        return {"id": self.id, "estado": self.estado, "total": self.total, "hechos": self.hechos,
+                "vehiculos": list(self.detalle), "error": self.error, "etapas_ms": dict(self.etapas)}
+
+
+class GestorTrabajos:
+    """Pool de hilos para trabajos largos. Los de un mismo propietario corren en serie.
+
+    El siguiente trabajo de un propietario se envía al pool cuando termina el anterior:
+    ningún hilo queda esperando mientras otro propietario tiene trabajo en cola.
+    """
+
+    def __init__(self, max_workers: int = 2, retencion_seg: int = 3600,
+                 al_descartar: Callable[[Trabajo], None] = None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trabajo")
+        self._trabajos: Dict[str, Trabajo] = {}
+        # Propietarios con un trabajo en curso -> los que esperan detrás
+        self._pendientes: Dict[str, Deque[Tuple[Trabajo, Callable]]] = {}
+        self._lock = threading.Lock()
+        self.retencion_seg, self.al_descartar = retencion_seg, al_descartar
+
+    def enviar(self, propietario: str, total: int, fn: Callable[[Trabajo], object]) -> Trabajo:
+        """Encola `fn(trabajo)`; lo que devuelva queda en `trabajo.resultado`."""
+        self._purgar()
+        trabajo = Trabajo(propietario, total)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            cola = self._pendientes.get(propietario)
+            if cola is not None:
+                cola.append((trabajo, fn))
+                return trabajo
+            self._pendientes[propietario] = deque()
+        self._pool.submit(self._ejecutar, trabajo, fn)
+        return trabajo
+
+    def obtener(self, trabajo_id: str, propietario: str) -> Optional[Trabajo]:
+        trabajo = self._trabajos.get(trabajo_id)
+        return trabajo if trabajo is not None and trabajo.propietario == propietario else None
+
+    def _ejecutar(self, trabajo, fn):
+        trabajo.estado = "ejecutando"
+        try:
+            trabajo.resultado = fn(trabajo)
+            trabajo.estado = "terminado"
+        except Exception as e:
+            trabajo.error, trabajo.estado = f"{type(e).__name__}: {e}", "error"
+        finally:
+            trabajo.terminado = time.time()
+            self._siguiente(trabajo.propietario)
+
+    def _siguiente(self, propietario):
+        with self._lock:
+            cola = self._pendientes[propietario]
+            if not cola:
+                del self._pendientes[propietario]
+                return
+            trabajo, fn = cola.popleft()
+        self._pool.submit(self._ejecutar, trabajo, fn)
+
+    def _purgar(self):
+        limite = time.time() - self.retencion_seg
+        with self._lock:
+            viejos = [t for t in self._trabajos.values() if t.terminado and t.terminado < limite]
+            for t in viejos: self._trabajos.pop(t.id, None)
+        for t in viejos:
+            if self.al_descartar is not None: self.al_descartar(t)